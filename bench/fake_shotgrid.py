@@ -0,0 +1,270 @@
+"""Local stand-in for the parts of the ShotGrid REST API the publish nodes use.
+
+It serves auth, entity reads and searches, version creates (single and _batch), updates and deletes, and the file
+upload flow, including multipart uploads and complete_upload. Every response is delayed by
+`latency` seconds to stand in for the round trip to a hosted site, and with throttle_rate set,
+requests beyond that rate are answered with 429 and a Retry-After header. Uploads of the part
+numbers in fail_parts are answered with 500, to interrupt a multipart upload.
+"""
+import itertools
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+PROJECT_ID = 1
+
+class FakeShotGrid:
+    def __init__(self, task_names, shot_count=100, artist_count=10, latency=0.0, project_id=PROJECT_ID, throttle_rate=None, retry_after=1):
+        self.latency = latency
+        # Requests per second served before answering 429 with a Retry-After of retry_after seconds, like a busy hosted site
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._allowance = throttle_rate or 0
+        self._allowance_at = time.monotonic()
+        self.project_id = project_id
+        self.shots = [{"type": "Shot", "id": idx, "attributes": {"code": f"BENCH_{idx * 10:04d}"}} for idx in range(1, shot_count + 1)]
+        self.tasks = []
+        for shot in self.shots:
+            for task_name in task_names:
+                self.tasks.append({
+                    "type": "Task",
+                    "id": len(self.tasks) + 1,
+                    "attributes": {"content": task_name},
+                    "relationships": {"entity": {"data": {"type": "Shot", "id": shot["id"], "name": shot["attributes"]["code"]}}},
+                })
+        self.artists = [{"type": "HumanUser", "id": idx, "attributes": {"login": f"artist{idx:02d}"}} for idx in range(1, artist_count + 1)]
+        self.versions = {}
+        self._version_ids = itertools.count(1)
+        # upload_id -> {"parts": {part_number: size}, "completed": bool}
+        self.uploads = {}
+        # Part numbers whose upload is answered with a 500, to interrupt multipart uploads
+        self.fail_parts = set()
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port=0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, name="fake-shotgrid", daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def throttled(self):
+        """Whether a request arriving now is over throttle_rate (a token bucket holding one second of requests)"""
+        if not self.throttle_rate:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.throttle_rate, self._allowance + (now - self._allowance_at) * self.throttle_rate)
+            self._allowance_at = now
+            if self._allowance < 1:
+                self.requests["throttled"] += 1
+                return True
+            self._allowance -= 1
+            return False
+
+    def create_version(self, data):
+        with self._lock:
+            version_id = next(self._version_ids)
+            self.versions[version_id] = data
+        return {"type": "Version", "id": version_id, "attributes": {"code": data.get("code")}}
+
+    def _records(self, entity, filters):
+        if entity == "Shot":
+            return self.shots
+        if entity == "HumanUser":
+            return self.artists
+        if entity == "Task":
+            tasks = self.tasks
+            for field, operator, value in filters:
+                values = value if operator == "in" else [value]
+                if field == "entity.Shot.code":
+                    tasks = [task for task in tasks if task["relationships"]["entity"]["data"]["name"] in values]
+                elif field == "content":
+                    tasks = [task for task in tasks if task["attributes"]["content"] in values]
+            return tasks
+        if entity == "Version":
+            with self._lock:
+                versions = [{"type": "Version", "id": version_id, "attributes": {"code": data.get("code")}} for version_id, data in self.versions.items()]
+            for field, operator, value in filters:
+                if field == "code":
+                    versions = [version for version in versions if version["attributes"]["code"] == value]
+                elif field == "sg_task.Task.id":
+                    versions = [version for version in versions if self.versions.get(version["id"], {}).get("sg_task", {}).get("id") == value]
+            return versions
+        return []
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this every response waits on a delayed ACK
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ("POST", re.compile(r"^/api/v1(?:\.1)?/auth/access_token$"), "auth"),
+        ("POST", re.compile(r"^/api/v1(?:\.1)?/entity/(?P<entity>\w+)/_search$"), "search"),
+        ("POST", re.compile(r"^/api/v1(?:\.1)?/entity/(?P<entity>\w+)/_summarize$"), "summarize"),
+        ("POST", re.compile(r"^/api/v1(?:\.1)?/entity/_batch$"), "batch"),
+        ("GET", re.compile(r"^/api/v1(?:\.1)?/entity/(?P<entity>Shot|Task|HumanUser)$"), "read"),
+        ("POST", re.compile(r"^/api/v1(?:\.1)?/entity/versions$"), "create_version"),
+        ("PUT", re.compile(r"^/api/v1(?:\.1)?/entity/versions/(?P<id>\d+)$"), "update_version"),
+        ("DELETE", re.compile(r"^/api/v1(?:\.1)?/entity/versions/(?P<id>\d+)$"), "delete_version"),
+        ("GET", re.compile(r"^/api/v1(?:\.1)?/entity/versions/(?P<id>\d+)/(?P<field>\w+)/_upload$"), "request_upload"),
+        ("GET", re.compile(r"^/api/v1(?:\.1)?/entity/versions/(?P<id>\d+)/(?P<field>\w+)/_upload/multipart$"), "next_part"),
+        ("POST", re.compile(r"^/api/v1(?:\.1)?/entity/versions/(?P<id>\d+)/(?P<field>\w+)/_upload$"), "complete_upload"),
+        ("PUT", re.compile(r"^/storage/(?P<upload_id>\w+)(?:/(?P<part>\d+))?$"), "store"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if fake.latency:
+            time.sleep(fake.latency)
+        if fake.throttled():
+            return self._send(429, {"errors": [{"status": 429, "title": "Too many requests"}]}, {"Retry-After": str(fake.retry_after)})
+        for route_method, pattern, name in self.ROUTES:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                with fake._lock:
+                    fake.requests[name] += 1
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                return getattr(self, f"_{name}")(fake, match, query, body)
+        self._send(404, {"errors": [{"status": 404, "title": f"No route for {method} {url.path}"}]})
+
+    def _send(self, status, payload=None, headers=None):
+        data = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _base_url(self):
+        return f"http://{self.headers['Host']}"
+
+    def _auth(self, fake, match, query, body):
+        self._send(200, {"token_type": "Bearer", "access_token": uuid.uuid4().hex, "refresh_token": uuid.uuid4().hex, "expires_in": 600})
+
+    def _search(self, fake, match, query, body):
+        records = fake._records(match["entity"], json.loads(body or b"{}").get("filters", []))
+        size = int(query.get("page[size]", 500))
+        number = int(query.get("page[number]", 1))
+        self._send(200, {"data": records[(number - 1) * size:number * size]})
+
+    def _summarize(self, fake, match, query, body):
+        records = fake._records(match["entity"], json.loads(body or b"{}").get("filters", []))
+        self._send(200, {"data": {"summaries": {"id": len(records)}}})
+
+    def _read(self, fake, match, query, body):
+        filters = []
+        if "filter[entity.Shot.code]" in query:
+            filters.append(["entity.Shot.code", "is", query["filter[entity.Shot.code]"]])
+        if "filter[content]" in query:
+            filters.append(["content", "is", query["filter[content]"]])
+        records = fake._records(match["entity"], filters)
+        if match["entity"] == "Shot" and "filter[code]" in query:
+            records = [shot for shot in records if shot["attributes"]["code"] == query["filter[code]"]]
+        size = int(query.get("page[size]", 500))
+        number = int(query.get("page[number]", 1))
+        self._send(200, {"data": records[(number - 1) * size:number * size]})
+
+    def _create_version(self, fake, match, query, body):
+        self._send(201, {"data": fake.create_version(json.loads(body))})
+
+    def _update_version(self, fake, match, query, body):
+        with fake._lock:
+            data = fake.versions.get(int(match["id"]))
+            if data is not None:
+                data.update(json.loads(body))
+        if data is None:
+            return self._send(404, {"errors": [{"status": 404, "title": "Unknown version"}]})
+        self._send(200, {"data": {"type": "Version", "id": int(match["id"]), "attributes": {"code": data.get("code")}}})
+
+    def _delete_version(self, fake, match, query, body):
+        with fake._lock:
+            deleted = fake.versions.pop(int(match["id"]), None)
+        if deleted is None:
+            return self._send(404, {"errors": [{"status": 404, "title": "Unknown version"}]})
+        self._send(204, None)
+
+    def _batch(self, fake, match, query, body):
+        results = [fake.create_version(request["data"]) for request in json.loads(body)["requests"]]
+        self._send(200, {"data": results})
+
+    def _request_upload(self, fake, match, query, body):
+        upload_id = uuid.uuid4().hex
+        with fake._lock:
+            fake.uploads[upload_id] = {"parts": {}, "completed": False}
+        version_path = f"/api/v1/entity/versions/{match['id']}/{match['field']}/_upload"
+        data = {
+            "timestamp": str(time.time()),
+            "upload_type": "Attachment",
+            "upload_id": upload_id,
+            "storage_service": "s3",
+            "original_filename": query.get("filename"),
+            "multipart_upload": query.get("multipart_upload") == "true",
+        }
+        links = {"upload": f"{self._base_url()}/storage/{upload_id}", "complete_upload": version_path}
+        if data["multipart_upload"]:
+            links["upload"] += "/1"
+            links["get_next_part"] = f"{version_path}/multipart?" + urlencode({"filename": data["original_filename"], "timestamp": data["timestamp"], "upload_id": upload_id})
+        self._send(200, {"data": data, "links": links})
+
+    def _next_part(self, fake, match, query, body):
+        self._send(200, {"links": {"upload": f"{self._base_url()}/storage/{query['upload_id']}/{int(query['part_number'])}"}})
+
+    def _store(self, fake, match, query, body):
+        if int(match["part"] or 1) in fake.fail_parts:
+            return self._send(500, {"errors": [{"status": 500, "title": "Storage unavailable"}]})
+        with fake._lock:
+            upload = fake.uploads.get(match["upload_id"])
+            if upload is not None:
+                upload["parts"][int(match["part"] or 1)] = len(body)
+        if upload is None:
+            return self._send(404, {"errors": [{"status": 404, "title": "Unknown upload"}]})
+        self._send(200, None, {"ETag": f'"{uuid.uuid4().hex}"'})
+
+    def _complete_upload(self, fake, match, query, body):
+        upload_id = json.loads(body)["upload_info"].get("upload_id")
+        with fake._lock:
+            upload = fake.uploads.get(upload_id)
+            if upload is not None:
+                upload["completed"] = True
+        if upload is None:
+            return self._send(400, {"errors": [{"status": 400, "title": "Unknown upload"}]})
+        self._send(201, None)
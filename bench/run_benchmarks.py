@@ -0,0 +1,289 @@
+"""Benchmark the publish path against synthetic sequences and a local ShotGrid stand-in.
+
+Times each stage of a publish (scan, frame validation, version allocation, copy, add_version, upload) and the
+end-to-end filesystem and node publishes, and prints the results as JSON so runs can be
+compared. Nothing outside the work folder is touched: the publish modules are loaded with a
+generated config.json that points at the fake server and writes into the work folder.
+
+    python bench/run_benchmarks.py --frames 200 --frame-mb 4 --latency 0.05 --output results.json
+    python bench/run_benchmarks.py --baseline results.json
+"""
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import types
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timezone
+from functools import partial
+
+from fake_shotgrid import FakeShotGrid, PROJECT_ID
+from synthetic import make_sequence, make_movie
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Name the repository is imported under, since its folder name need not be a valid module name
+PACKAGE_NAME = "movielabs_publish_bench"
+
+MB = 1024 * 1024
+
+class Stage:
+    """Wall-clock samples of one benchmark stage, with the items and bytes each sample handled"""
+    def __init__(self):
+        self.samples = []
+        self.items = 0
+        self.bytes = 0
+
+    @contextmanager
+    def measure(self, items=1, bytes=0):
+        start = time.perf_counter()
+        yield
+        self.samples.append(time.perf_counter() - start)
+        self.items += items
+        self.bytes += bytes
+
+    def summary(self):
+        samples = sorted(self.samples)
+        total = sum(samples)
+        result = {
+            "samples": len(samples),
+            "total_s": round(total, 6),
+            "mean_ms": round(total / len(samples) * 1000, 3),
+            "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(_percentile(samples, 95) * 1000, 3),
+            "min_ms": round(samples[0] * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+            "items_per_s": round(self.items / total, 3) if total else None,
+        }
+        if self.bytes:
+            result["mb_per_s"] = round(self.bytes / MB / total, 3) if total else None
+        return result
+
+def _percentile(samples, percent):
+    return samples[min(len(samples) - 1, max(0, math.ceil(len(samples) * percent / 100) - 1))]
+
+def write_config(work_dir, server_url, args):
+    """config.json for the benchmark run, based on the repository's own conventions"""
+    with open(os.path.join(REPO_DIR, "config.json"), "r") as f:
+        config = json.load(f)
+    config["shotgrid"].update({
+        "project_id": PROJECT_ID,
+        "server_url": server_url,
+        "client_id": "bench",
+        "secret_file_path": "secret.txt",
+        "upload_part_size_mb": args.part_mb,
+        "upload_workers": args.upload_workers,
+    })
+    config["publish_queue"] = {"workers": 1, "journal_path": "publish_jobs.sqlite"}
+    config["metrics"] = {"enabled": args.metrics, "events_path": "metrics/publish_events.jsonl", "textfile_path": "metrics/movielabs_publish.prom"}
+    config["filesystem"].update({
+        "output_dir": [os.path.join(work_dir, "publish"), "{SEQ_CODE}", "{SHOT_CODE}"],
+        "copy_workers": args.copy_workers,
+        "publish_mode": args.publish_mode,
+        "dedupe": args.dedupe,
+    })
+    with open(os.path.join(work_dir, "secret.txt"), "w") as f:
+        f.write("bench")
+    config_path = os.path.join(work_dir, "config.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=4)
+    return config_path
+
+def load_publish_modules(config_path):
+    """Import the publish modules configured by config_path"""
+    os.environ["PUBLISH_CONFIG_PATH"] = config_path
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [REPO_DIR]
+    sys.modules[PACKAGE_NAME] = package
+    names = ("config", "fs", "transfer", "validate", "shotgrid", "upload", "catalog", "publish_asset")
+    return types.SimpleNamespace(**{name: importlib.import_module(f"{PACKAGE_NAME}.publish.{name}") for name in names})
+
+def run(args, work_dir):
+    fake = FakeShotGrid(args.task_names, shot_count=args.shots, latency=args.latency, throttle_rate=args.throttle_rate)
+    server_url = fake.start()
+    try:
+        config_path = write_config(work_dir, server_url, args)
+        source_dir = os.path.join(work_dir, "source", "frames")
+        frames = make_sequence(source_dir, args.frames, int(args.frame_mb * MB), args.format)
+        proxy = make_movie(os.path.join(work_dir, "source", "proxy.mov"), int(args.proxy_mb * MB))
+        frame_bytes = sum(os.path.getsize(path) for path in frames)
+        proxy_bytes = os.path.getsize(proxy)
+
+        started = time.perf_counter()
+        modules = load_publish_modules(config_path)
+        import_s = time.perf_counter() - started
+        fs, transfer, shotgrid, upload = modules.fs, modules.transfer, modules.shotgrid, modules.upload
+        shotgrid_config = modules.config.shotgrid_config
+        stages = {}
+
+        shot_code = fake.shots[0]["attributes"]["code"]
+        stages["scan"] = Stage()
+        for _ in range(args.repeat):
+            with stages["scan"].measure(items=args.frames):
+                fs.ensure_image_sequence(source_dir)
+
+        stages["validate"] = Stage()
+        sequence, _ = fs.ensure_image_sequence(source_dir)
+        for _ in range(args.repeat):
+            with stages["validate"].measure(items=args.frames):
+                modules.validate.validate_frames(path for _, path in sequence.items())
+
+        stages["version_allocation"] = Stage()
+        task_dir = fs.get_task_dir(fs.get_output_dir(fake.shots[-1]["attributes"]["code"]), args.task)
+        for _ in range(args.allocations):
+            with stages["version_allocation"].measure():
+                fs.reserve_next_version(args.task, task_dir)
+
+        stages["copy"] = Stage()
+        for idx in range(args.repeat):
+            copy_dir = os.path.join(work_dir, "copy", str(idx))
+            os.makedirs(copy_dir)
+            pairs = [(path, os.path.join(copy_dir, os.path.basename(path))) for path in frames]
+            with stages["copy"].measure(items=len(pairs), bytes=frame_bytes):
+                transfer.copy_files(pairs, copy_fn=partial(transfer.publish_file, mode=args.publish_mode))
+
+        # The first publish copies every frame, later ones are unchanged and may be deduplicated
+        stages["create_task_version"] = Stage()
+        stages["create_task_version_unchanged"] = Stage()
+        for idx in range(args.repeat):
+            stage = stages["create_task_version" if idx == 0 else "create_task_version_unchanged"]
+            with stage.measure(items=args.frames, bytes=frame_bytes + proxy_bytes):
+                fs.create_task_version(shot_code, args.task, frames[0], proxy)
+        if not stages["create_task_version_unchanged"].samples:
+            del stages["create_task_version_unchanged"]
+
+        started = time.perf_counter()
+        sg = shotgrid.get_session(shotgrid_config, fake.artists[0]["attributes"]["login"])
+        auth_s = time.perf_counter() - started
+        shot_id = fake.shots[0]["id"]
+        task_id = sg.get_tasks(shot_code, args.task)[0]["id"]
+
+        stages["add_version"] = Stage()
+        version_ids = []
+        for idx in range(args.versions):
+            with stages["add_version"].measure():
+                sg_version = sg.add_version(f"{shot_code}_BENCH_v{idx + 1:03d}", shot_id, task_id, {"sg_notes": "benchmark"})
+            version_ids.append(sg_version["id"])
+
+        stages["upload"] = Stage()
+        for idx in range(args.repeat):
+            with stages["upload"].measure(bytes=proxy_bytes):
+                upload.upload_movie(sg, version_ids[idx % len(version_ids)], "sg_uploaded_movie", proxy, fs.mime_type_from_file_path(proxy))
+
+        stages["publish_asset"] = Stage()
+        node = modules.publish_asset.PublishAsset()
+        publish_args = (fake.artists[0]["attributes"]["login"], shot_code, args.task, source_dir, proxy, "benchmark")
+        for _ in range(args.repeat):
+            with stages["publish_asset"].measure(items=args.frames, bytes=frame_bytes + proxy_bytes):
+                # Forced, or every run after the first would be skipped as already published
+                node.publish_asset(*publish_args, force=True)
+
+        stages["publish_asset_unchanged"] = Stage()
+        for _ in range(args.repeat):
+            with stages["publish_asset_unchanged"].measure(items=args.frames):
+                node.publish_asset(*publish_args)
+
+        return {
+            "benchmark": "publish",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+            "params": {
+                "frames": args.frames,
+                "frame_bytes": frame_bytes // args.frames,
+                "format": args.format,
+                "proxy_bytes": proxy_bytes,
+                "latency_s": args.latency,
+                "throttle_rate": args.throttle_rate,
+                "task": args.task,
+                "publish_mode": args.publish_mode,
+                "dedupe": args.dedupe,
+                "copy_workers": args.copy_workers,
+                "upload_part_size_mb": args.part_mb,
+                "upload_workers": args.upload_workers,
+                "repeat": args.repeat,
+                "metrics": args.metrics,
+            },
+            "setup": {"import_s": round(import_s, 6), "auth_s": round(auth_s, 6)},
+            "stages": {name: stage.summary() for name, stage in stages.items()},
+            "requests": dict(fake.requests),
+        }
+    finally:
+        fake.stop()
+
+def compare(results, baseline):
+    """Lines comparing the mean time of every stage with a previous run"""
+    lines = [f"{'stage':32} {'baseline ms':>12} {'current ms':>12} {'change':>8}"]
+    for name, stage in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if previous is None:
+            lines.append(f"{name:32} {'-':>12} {stage['mean_ms']:>12.3f} {'new':>8}")
+            continue
+        change = (stage["mean_ms"] - previous["mean_ms"]) / previous["mean_ms"] * 100 if previous["mean_ms"] else 0.0
+        lines.append(f"{name:32} {previous['mean_ms']:>12.3f} {stage['mean_ms']:>12.3f} {change:>+7.1f}%")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--frames", type=int, default=100, help="Frames in the synthetic sequence")
+    parser.add_argument("--frame-mb", type=float, default=1.0, help="Approximate size of each frame in MB")
+    parser.add_argument("--format", choices=("exr", "png"), default="exr")
+    parser.add_argument("--proxy-mb", type=float, default=32.0, help="Size of the proxy movie in MB")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the fake ShotGrid server waits before each response")
+    parser.add_argument("--throttle-rate", type=float, help="Requests per second the fake ShotGrid server serves before answering 429")
+    parser.add_argument("--task", default="Comp", help="Task whose naming convention is published to")
+    parser.add_argument("--publish-mode", choices=("copy", "zero_copy"), default="copy")
+    parser.add_argument("--no-dedupe", dest="dedupe", action="store_false", help="Publish without content hashing")
+    parser.add_argument("--copy-workers", type=int, default=8)
+    parser.add_argument("--part-mb", type=int, default=16, help="Upload part size in MB")
+    parser.add_argument("--upload-workers", type=int, default=4)
+    parser.add_argument("--metrics", action="store_true", help="Record publish metrics, to measure their overhead")
+    parser.add_argument("--shots", type=int, default=100, help="Shots served by the fake ShotGrid server")
+    parser.add_argument("--allocations", type=int, default=200, help="Version numbers reserved in the allocation stage")
+    parser.add_argument("--versions", type=int, default=20, help="Versions created in the add_version stage")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the scan, copy, publish and upload stages")
+    parser.add_argument("--work-dir", help="Folder for the synthetic files and publishes (a temporary folder by default, removed afterwards)")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    args = parser.parse_args()
+    if args.frames < 1 or args.repeat < 1 or args.versions < 1 or args.allocations < 1:
+        parser.error("--frames, --repeat, --versions and --allocations must be at least 1")
+
+    with open(os.path.join(REPO_DIR, "config.json"), "r") as f:
+        repo_config = json.load(f)
+    args.task_names = repo_config["task_names"]
+    sequence_tasks = [
+        task_name for task_name, convention in repo_config["filesystem"]["version_convention"].items()
+        if task_name in args.task_names and args.format in convention.get("image_ext", []) and convention.get("proxy") == "movie"
+    ]
+    if args.task not in sequence_tasks:
+        parser.error(f"--task must be a {args.format} sequence task with a movie proxy: {', '.join(sequence_tasks)}")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="publish-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        # The publish path prints progress; keep stdout for the JSON results
+        with redirect_stdout(sys.stderr):
+            results = run(args, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(results, baseline)), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import struct
+import zlib
+
+# Uncompressed half-float RGBA, 8 bytes per pixel
+EXR_CHANNELS = ("A", "B", "G", "R")
+EXR_BYTES_PER_PIXEL = 2 * len(EXR_CHANNELS)
+
+# 8-bit RGB
+PNG_BYTES_PER_PIXEL = 3
+
+def _frame_size(frame_bytes, bytes_per_pixel, max_width=1920):
+    """Width and height of an image whose pixel data is about frame_bytes"""
+    pixels = max(1, frame_bytes // bytes_per_pixel)
+    width = max(1, min(max_width, pixels))
+    height = max(1, pixels // width)
+    return width, height
+
+def _exr_attribute(name, type_name, value):
+    return name.encode() + b"\0" + type_name.encode() + b"\0" + struct.pack("<i", len(value)) + value
+
+def exr_header(width, height):
+    """Single-part scanline OpenEXR header of an uncompressed half RGBA image"""
+    channels = b"".join(name.encode() + b"\0" + struct.pack("<iB3xii", 1, 0, 1, 1) for name in EXR_CHANNELS) + b"\0"
+    window = struct.pack("<iiii", 0, 0, width - 1, height - 1)
+    return b"".join([
+        struct.pack("<ii", 20000630, 2),
+        _exr_attribute("channels", "chlist", channels),
+        _exr_attribute("compression", "compression", b"\0"),
+        _exr_attribute("dataWindow", "box2i", window),
+        _exr_attribute("displayWindow", "box2i", window),
+        _exr_attribute("lineOrder", "lineOrder", b"\0"),
+        _exr_attribute("pixelAspectRatio", "float", struct.pack("<f", 1.0)),
+        _exr_attribute("screenWindowCenter", "v2f", struct.pack("<ff", 0.0, 0.0)),
+        _exr_attribute("screenWindowWidth", "float", struct.pack("<f", 1.0)),
+        b"\0",
+    ])
+
+def write_exr(path, width, height, pixels):
+    """Write a valid uncompressed EXR, its scanlines filled from the pixels buffer"""
+    header = exr_header(width, height)
+    line_size = width * EXR_BYTES_PER_PIXEL
+    block_size = 8 + line_size
+    first_block = len(header) + 8 * height
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(struct.pack(f"<{height}Q", *(first_block + y * block_size for y in range(height))))
+        for y in range(height):
+            start = (y * line_size) % max(1, len(pixels) - line_size + 1)
+            f.write(struct.pack("<ii", y, line_size))
+            f.write(pixels[start:start + line_size].ljust(line_size, b"\0"))
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff)
+
+def write_png(path, width, height, pixels):
+    """Write a valid 8-bit RGB PNG, its rows filled from the pixels buffer and stored uncompressed"""
+    line_size = width * PNG_BYTES_PER_PIXEL
+    rows = []
+    for y in range(height):
+        start = (y * line_size) % max(1, len(pixels) - line_size + 1)
+        rows.append(b"\0" + pixels[start:start + line_size].ljust(line_size, b"\0"))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(_png_chunk(b"IDAT", zlib.compress(b"".join(rows), 0)))
+        f.write(_png_chunk(b"IEND", b""))
+
+def make_sequence(dir_path, frame_count, frame_bytes, ext="exr", prefix="bench_", start=1001):
+    """Write frame_count frames of about frame_bytes each, returning the list of paths.
+
+    Every frame has different pixels so content hashing sees distinct files.
+    """
+    os.makedirs(dir_path, exist_ok=True)
+    bytes_per_pixel = EXR_BYTES_PER_PIXEL if ext == "exr" else PNG_BYTES_PER_PIXEL
+    width, height = _frame_size(frame_bytes, bytes_per_pixel)
+    noise = os.urandom(width * height * bytes_per_pixel + 4096)
+    write = write_exr if ext == "exr" else write_png
+    paths = []
+    for idx in range(frame_count):
+        path = os.path.join(dir_path, f"{prefix}{start + idx:04d}.{ext}")
+        offset = (idx * 4093) % 4096
+        write(path, width, height, noise[offset:])
+        paths.append(path)
+    return paths
+
+def make_movie(path, size):
+    """Write a movie-sized file of random bytes behind a QuickTime ftyp box"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ftyp = struct.pack(">I", 20) + b"ftypqt  " + struct.pack(">I", 0x200) + b"qt  "
+    chunk = os.urandom(min(size, 4 * 1024 * 1024))
+    with open(path, "wb") as f:
+        f.write(ftyp)
+        remaining = max(0, size - len(ftyp))
+        while remaining > 0:
+            f.write(chunk[:remaining])
+            remaining -= min(remaining, len(chunk))
+    return path
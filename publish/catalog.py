@@ -0,0 +1,220 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+
+from .config import shotgrid_config, resolve_path
+from .db import connect
+from .shotgrid import get_session
+
+# Seconds a publish waits for the catalog before giving up
+CATALOG_TIMEOUT = 60
+
+DEFAULT_CACHE_TTL = 15 * 60
+
+# Matches returned by a catalog search when the caller gives no limit
+DEFAULT_SEARCH_LIMIT = 50
+
+def _search_index(values):
+    """(lower-cased value, value) pairs sorted for prefix search"""
+    return sorted((value.lower(), value) for value in values)
+
+def _prefix_search(index, prefix, limit):
+    prefix = prefix.lower()
+    matches = []
+    for idx in range(bisect_left(index, (prefix,)), len(index)):
+        key, value = index[idx]
+        if not key.startswith(prefix) or len(matches) >= limit:
+            break
+        matches.append(value)
+    return matches
+
+class CatalogCache:
+    """SQLite copy of the Shot, Task and HumanUser records of a project"""
+    def __init__(self, path):
+        self.path = path
+        with connect(self.path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS records (project_id INTEGER, entity TEXT, id INTEGER, data TEXT, PRIMARY KEY (project_id, entity, id))")
+            conn.execute("CREATE TABLE IF NOT EXISTS fetches (project_id INTEGER PRIMARY KEY, fetched_at REAL)")
+
+    def load(self, project_id):
+        """Return ({entity: [records]}, fetched_at), fetched_at being None if the project was never cached"""
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT fetched_at FROM fetches WHERE project_id = ?", (project_id,)).fetchone()
+            if row is None:
+                return {}, None
+            records = {}
+            for entity, data in conn.execute("SELECT entity, data FROM records WHERE project_id = ? ORDER BY entity, id", (project_id,)):
+                records.setdefault(entity, []).append(json.loads(data))
+            return records, row[0]
+
+    def save(self, project_id, records, fetched_at):
+        """Replace everything cached for the project with a fresh bulk fetch"""
+        with connect(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM records WHERE project_id = ?", (project_id,))
+                conn.executemany(
+                    "INSERT INTO records (project_id, entity, id, data) VALUES (?, ?, ?, ?)",
+                    ((project_id, entity, record["id"], json.dumps(record)) for entity, rows in records.items() for record in rows),
+                )
+                conn.execute("INSERT OR REPLACE INTO fetches (project_id, fetched_at) VALUES (?, ?)", (project_id, fetched_at))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+class Catalog:
+    """Shots, tasks and artist logins of the project, served from a local cache.
+
+    The cache is read and refreshed from ShotGrid in a background thread, so reads never
+    block unless a timeout is given and the nodes can register before ShotGrid responds.
+    Entries older than the TTL keep being served while a refresh runs (stale-while-revalidate),
+    and a failed refresh (401, network error) keeps the cached data.
+    """
+    def __init__(self, config, cache):
+        self.config = config
+        self.cache = cache
+        self.ttl = config.get("cache_ttl", DEFAULT_CACHE_TTL)
+        self.shots = {}
+        self.artist_logins = []
+        self.tasks = {}
+        self.task_names = {}
+        self._shot_index = []
+        self._artist_index = []
+        self.fetched_at = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def is_stale(self):
+        return self.fetched_at is None or time.time() - self.fetched_at > self.ttl
+
+    def start(self, force=False):
+        with self._lock:
+            if self._thread is not None or not (force or self.is_stale()):
+                return
+            if self.fetched_at is None:
+                # Nothing to serve yet, so waiters block on this attempt
+                self._ready.clear()
+            self._thread = threading.Thread(target=self._run, args=(force,), name="shotgrid-catalog", daemon=True)
+            self._thread.start()
+
+    def _run(self, force=False):
+        try:
+            if self.fetched_at is None:
+                records, fetched_at = self.cache.load(self.config["project_id"])
+                if fetched_at is not None:
+                    self._apply(records, fetched_at)
+                    self._ready.set()
+            if force or self.is_stale():
+                records, fetched_at = self._fetch()
+                self.cache.save(self.config["project_id"], records, fetched_at)
+                self._apply(records, fetched_at)
+            self.error = None
+        except Exception as e:
+            self.error = e
+            print(f"Could not refresh shots, tasks and artists from ShotGrid: {e}")
+        finally:
+            with self._lock:
+                self._thread = None
+            self._ready.set()
+
+    def _fetch(self):
+        fetched_at = time.time()
+        sg = get_session(self.config, None)
+        records = {
+            "Shot": sg.get_shots(),
+            "Task": sg.get_project_tasks(),
+            "HumanUser": sg.get_artists(),
+        }
+        return records, fetched_at
+
+    def _apply(self, records, fetched_at):
+        shots = {shot["attributes"]["code"]: shot for shot in records.get("Shot", []) if "attributes" in shot and "code" in shot["attributes"]}
+        shot_codes = {shot["id"]: code for code, shot in shots.items()}
+        tasks = {}
+        for task in records.get("Task", []):
+            entity = task.get("relationships", {}).get("entity", {}).get("data") or {}
+            shot_code = shot_codes.get(entity.get("id")) if entity.get("type") == "Shot" else None
+            if shot_code is not None:
+                tasks.setdefault((shot_code, task["attributes"]["content"]), []).append(task)
+        task_names = {}
+        for shot_code, task_name in tasks:
+            task_names.setdefault(shot_code, []).append(task_name)
+        artist_logins = [artist["attributes"]["login"] for artist in records.get("HumanUser", [])]
+        # Swap in complete structures so readers never see a half-built catalog
+        self.shots = shots
+        self.tasks = tasks
+        self.task_names = {shot_code: sorted(names) for shot_code, names in task_names.items()}
+        self.artist_logins = artist_logins
+        self._shot_index = _search_index(shots)
+        self._artist_index = _search_index(artist_logins)
+        self.fetched_at = fetched_at
+
+    def wait(self, timeout=None):
+        """Wait until there is something to serve; returns False if nothing could be loaded"""
+        self.start()
+        self._ready.wait(timeout)
+        return self.fetched_at is not None
+
+    def require_shots(self, timeout=None):
+        """Shots for a publish, waiting for the catalog and raising if ShotGrid could not be reached"""
+        if not self.wait(CATALOG_TIMEOUT if timeout is None else timeout):
+            raise Exception(f"Could not load shots from ShotGrid: {self.error or 'timed out'}")
+        return self.shots
+
+    def require_shot(self, shot_code, sg=None):
+        """Shot record for a publish, raising if it does not exist.
+
+        A shot created since the last refresh is looked up in ShotGrid (with sg, or the script
+        user's session) and the catalog refreshed in the background to pick it up.
+        """
+        shots = self.require_shots()
+        if shot_code in shots:
+            return shots[shot_code]
+        sg_shots = (sg or get_session(self.config, None)).get_shot(shot_code) if shot_code else []
+        if not sg_shots:
+            raise Exception(f"Shot {shot_code} not found")
+        self.start(force=True)
+        return sg_shots[0]
+
+    def get_shots(self, timeout=0):
+        self.wait(timeout)
+        return self.shots
+
+    def get_artist_logins(self, timeout=0):
+        self.wait(timeout)
+        return self.artist_logins
+
+    def search_shots(self, prefix="", limit=DEFAULT_SEARCH_LIMIT):
+        """Cached shot codes starting with prefix (ignoring case), in order"""
+        self.start()
+        return _prefix_search(self._shot_index, prefix, limit)
+
+    def search_artists(self, prefix="", limit=DEFAULT_SEARCH_LIMIT):
+        """Cached artist logins starting with prefix (ignoring case), in order"""
+        self.start()
+        return _prefix_search(self._artist_index, prefix, limit)
+
+    def search_tasks(self, shot_code, prefix="", limit=DEFAULT_SEARCH_LIMIT):
+        """Names of the cached tasks of a shot starting with prefix (ignoring case)"""
+        self.start()
+        prefix = prefix.lower()
+        return [name for name in self.task_names.get(shot_code, []) if name.lower().startswith(prefix)][:limit]
+
+    def require_artist(self, artist_login):
+        """Raise unless artist_login is a known artist, once the catalog could be loaded"""
+        if not artist_login:
+            raise Exception("Select your artist login")
+        if self.wait(CATALOG_TIMEOUT) and artist_login not in self.artist_logins:
+            raise Exception(f"Artist login {artist_login} not found")
+
+    def get_tasks(self, shot_code, task_name):
+        """Cached tasks of a shot; tasks created since the last refresh are not listed yet"""
+        self.start()
+        return self.tasks.get((shot_code, task_name), [])
+
+catalog = Catalog(shotgrid_config, CatalogCache(resolve_path(shotgrid_config.get("cache_path", "shotgrid_cache.sqlite"))))
+catalog.start()
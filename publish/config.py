@@ -1,32 +1,95 @@
 import os
 from pathlib import Path
 import json
+import threading
+import time
+
+from .conventions import compile_conventions
 
 # Get the parent directory of the current file's parent (the project root)
 config_dir = Path(__file__).parent.parent
 
-# Construct the path to config.json
-config_path = os.path.join(config_dir, "config.json")
+# Construct the path to config.json; PUBLISH_CONFIG_PATH points to another one (e.g. for the benchmarks)
+config_path = os.environ.get("PUBLISH_CONFIG_PATH") or os.path.join(config_dir, "config.json")
 if not os.path.exists(config_path):
-    raise Exception("config.json not found")
+    raise Exception(f"{config_path} not found")
+config_dir = os.path.dirname(os.path.abspath(config_path))
+
+# Seconds between checks of whether config.json changed
+RELOAD_CHECK_INTERVAL = 1.0
 
-with open(config_path, "r") as f:
-    config = json.load(f)
+def resolve_path(path):
+    """Resolve a path from config.json, relative paths being relative to the folder of config.json"""
+    if not os.path.isabs(path):
+        path = os.path.join(config_dir, path)
+    return path
 
-# Get the secret file path from the config
-secret_file_path = config["shotgrid"].get("secret_file_path", "shotgrid_secret.txt")
+def load_config(path):
+    """Read config.json and the ShotGrid secret, and compile the naming conventions, raising if any is invalid"""
+    with open(path, "r") as f:
+        config = json.load(f)
 
-# If the path is not absolute, resolve it relative to the project root
-if not os.path.isabs(secret_file_path):
-    secret_file_path = os.path.join(config_dir, secret_file_path)
+    # Get the secret file path from the config
+    secret_file_path = resolve_path(config["shotgrid"].get("secret_file_path", "shotgrid_secret.txt"))
 
-if not os.path.exists(secret_file_path):
-    raise Exception(f"Secret file not found at {secret_file_path}. Please check the 'secret_file_path' in your config.json.")
+    if not os.path.exists(secret_file_path):
+        raise Exception(f"Secret file not found at {secret_file_path}. Please check the 'secret_file_path' in your config.json.")
 
-with open(secret_file_path, "r") as f:
-    client_secret = f.read().strip()
+    with open(secret_file_path, "r") as f:
+        config["shotgrid"]["client_secret"] = f.read().strip()  # Add the secret to the config
 
+    return config, compile_conventions(config)
+
+config, conventions = load_config(config_path)
 filesystem_config = config["filesystem"]
 shotgrid_config = config["shotgrid"]
-shotgrid_config["client_secret"] = client_secret  # Add the secret to the config
 task_names = config["task_names"]
+
+_config_mtime = os.stat(config_path).st_mtime_ns
+_checked_at = time.monotonic()
+_reload_lock = threading.Lock()
+
+def _update_in_place(target, source):
+    # Keys present before and after stay readable throughout, for publishes running meanwhile
+    for key in [key for key in target if key not in source]:
+        del target[key]
+    target.update(source)
+
+def reload_config(force=False):
+    """Re-read config.json if it changed since it was loaded, returning True if it was reloaded.
+
+    Settings are updated in place, so modules holding filesystem_config, shotgrid_config or
+    task_names see the new values. An invalid file is reported and ignored, keeping the last
+    good conventions. Paths read at startup (caches, job journal, metrics) need a restart.
+    """
+    global conventions, _config_mtime, _checked_at
+    with _reload_lock:
+        _checked_at = time.monotonic()
+        try:
+            mtime = os.stat(config_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == _config_mtime and not force:
+            return False
+        _config_mtime = mtime
+        try:
+            new_config, new_conventions = load_config(config_path)
+        except Exception as e:
+            print(f"Ignoring changes to {config_path}: {e}")
+            return False
+        _update_in_place(filesystem_config, new_config.pop("filesystem"))
+        _update_in_place(shotgrid_config, new_config.pop("shotgrid"))
+        task_names[:] = new_config.pop("task_names")
+        config.update(new_config)
+        conventions = new_conventions
+        print(f"Reloaded {config_path}")
+        return True
+
+def get_convention(task_name):
+    """Compiled naming convention of a task, picking up changes to config.json first"""
+    if time.monotonic() - _checked_at >= RELOAD_CHECK_INTERVAL:
+        reload_config()
+    convention = conventions.get(task_name)
+    if convention is None:
+        raise ValueError(f"No naming convention for task {task_name}")
+    return convention
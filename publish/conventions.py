@@ -0,0 +1,156 @@
+import re
+from string import Formatter
+from types import MappingProxyType
+
+# How publish_file writes files, set with publish_mode (see transfer.py)
+PUBLISH_MODES = ("copy", "zero_copy")
+
+# Codecs a task can store its published files with, set with compression (see storage.py)
+COMPRESSIONS = ("none", "zstd")
+
+# Kinds of file a task publishes, and the key listing each kind's extensions
+FILE_KINDS = {"image": "image_ext", "movie": "movie_ext", "file": "file_ext"}
+
+# Keys of a task convention that describe its naming; any other key is a publish setting override
+CONVENTION_KEYS = {"parent_dir", "version_dir", "original", "proxy"} | set(FILE_KINDS) | set(FILE_KINDS.values())
+
+FILE_RESERVATION_PATTERN = re.compile(r"^v(\d{3})$")
+
+def format_string_to_version_regex(format_string):
+    # Escape regex special characters except for the {VERSION_NUMBER} placeholder
+    regex = re.escape(format_string)
+    # Replace the escaped placeholder with a regex group to capture the version number
+    regex = regex.replace(r'\{VERSION_NUMBER\}', r'(\d{3})')
+    # Anchor the regex to match the full string
+    regex = f'^{regex}$'
+    return re.compile(regex)
+
+def template_fields(template, allowed, where):
+    """Placeholders of a str.format template, raising if it has one outside allowed or is malformed"""
+    if not isinstance(template, str) or not template:
+        raise ValueError(f"{where} must be a non-empty string")
+    try:
+        parsed = list(Formatter().parse(template))
+    except ValueError as e:
+        raise ValueError(f"{where} is not a valid template: {e}")
+    fields = []
+    for _, field, spec, conversion in parsed:
+        if field is None:
+            continue
+        if field not in allowed or spec or conversion:
+            raise ValueError(f"{where} has an unsupported placeholder {{{field}}}, use {', '.join('{' + name + '}' for name in sorted(allowed))}")
+        fields.append(field)
+    return fields
+
+class TaskConvention:
+    """Validated, read-only naming convention of one task, compiled from config.json"""
+    __slots__ = ("name", "parent_dir", "version_dir", "templates", "extensions", "original", "proxy", "settings", "reservation_regex", "image_sequence")
+
+    def __init__(self, name, raw):
+        where = f"version_convention of task {name}"
+        if not isinstance(raw, dict):
+            raise ValueError(f"{where} must be an object")
+
+        parent_dir = raw.get("parent_dir")
+        if not isinstance(parent_dir, list) or not parent_dir or not all(isinstance(part, str) and part for part in parent_dir):
+            raise ValueError(f"{where}: parent_dir must be a non-empty list of folder names")
+
+        version_dir = raw.get("version_dir")
+        if version_dir is not None:
+            if template_fields(version_dir, {"VERSION_NUMBER"}, f"{where}: version_dir") != ["VERSION_NUMBER"]:
+                raise ValueError(f"{where}: version_dir must contain {{VERSION_NUMBER}} once")
+            if "/" in version_dir or "\\" in version_dir:
+                raise ValueError(f"{where}: version_dir must be a single folder name")
+
+        templates = {}
+        extensions = {}
+        for kind, ext_key in FILE_KINDS.items():
+            if raw.get(kind) is None:
+                continue
+            allowed = {"SHOT_CODE", "VERSION_NUMBER", "FRAME_NUMBER"} if kind == "image" else {"SHOT_CODE", "VERSION_NUMBER"}
+            template_fields(raw[kind], allowed, f"{where}: {kind}")
+            ext = raw.get(ext_key)
+            if not isinstance(ext, list) or not ext or not all(isinstance(value, str) and value and not value.startswith(".") for value in ext):
+                raise ValueError(f"{where}: {ext_key} must be a non-empty list of extensions without dots")
+            templates[kind] = raw[kind]
+            extensions[kind] = tuple(value.lower() for value in ext)
+
+        original = raw.get("original")
+        if original not in templates:
+            raise ValueError(f"{where}: original must name one of its file kinds ({', '.join(templates) or 'none defined'})")
+        proxy = raw.get("proxy")
+        if proxy is not None and proxy not in templates:
+            raise ValueError(f"{where}: proxy must be null or name one of its file kinds ({', '.join(templates)})")
+        if version_dir is None and not templates[original].endswith("_v{VERSION_NUMBER}"):
+            # Without version folders the version is read back from the end of the file name
+            raise ValueError(f"{where}: without a version_dir, {original} must end with _v{{VERSION_NUMBER}}")
+
+        settings = {key: value for key, value in raw.items() if key not in CONVENTION_KEYS}
+        if "publish_mode" in settings and settings["publish_mode"] not in PUBLISH_MODES:
+            raise ValueError(f"{where}: publish_mode must be {', '.join(PUBLISH_MODES)}")
+        if "compression" in settings and settings["compression"] not in COMPRESSIONS:
+            raise ValueError(f"{where}: compression must be {', '.join(COMPRESSIONS)}")
+
+        values = {
+            "name": name,
+            "parent_dir": tuple(parent_dir),
+            "version_dir": version_dir,
+            "templates": MappingProxyType(templates),
+            "extensions": MappingProxyType(extensions),
+            "original": original,
+            "proxy": proxy,
+            "settings": MappingProxyType(settings),
+            "reservation_regex": format_string_to_version_regex(version_dir) if version_dir else FILE_RESERVATION_PATTERN,
+            # Tasks accepting EXR or PNG images publish the whole sequence next to the given frame
+            "image_sequence": any(ext in extensions.get("image", ()) for ext in ("exr", "png")),
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Task conventions are read-only, edit config.json instead")
+
+    def __repr__(self):
+        return f"TaskConvention({self.name!r})"
+
+    def version_dir_name(self, version_number):
+        """Name of the version folder, or None if versions are published straight into the task folder"""
+        if self.version_dir is None:
+            return None
+        return self.version_dir.format(VERSION_NUMBER=version_number)
+
+    def reservation_name(self, version_number):
+        """Name of the marker that reserves a version number"""
+        if self.version_dir is None:
+            return f"v{version_number}"
+        return self.version_dir.format(VERSION_NUMBER=version_number)
+
+    def file_name(self, kind, shot_code, version_number, frame_number=None):
+        return self.templates[kind].format(SHOT_CODE=shot_code, VERSION_NUMBER=version_number, FRAME_NUMBER=frame_number)
+
+def compile_conventions(config):
+    """Validate the naming conventions of config.json and compile them into {task_name: TaskConvention}"""
+    filesystem = config.get("filesystem")
+    if not isinstance(filesystem, dict) or not isinstance(filesystem.get("version_convention"), dict):
+        raise ValueError("config.json has no filesystem.version_convention")
+    output_dir = filesystem.get("output_dir")
+    if not isinstance(output_dir, list) or not output_dir:
+        raise ValueError("filesystem.output_dir must be a non-empty list of folder names")
+    for part in output_dir:
+        template_fields(part, {"SEQ_CODE", "SHOT_CODE"}, "filesystem.output_dir")
+    if filesystem.get("publish_mode", "copy") not in PUBLISH_MODES:
+        raise ValueError(f"filesystem.publish_mode must be {', '.join(PUBLISH_MODES)}")
+    if filesystem.get("compression", "none") not in COMPRESSIONS:
+        raise ValueError(f"filesystem.compression must be {', '.join(COMPRESSIONS)}")
+
+    conventions = {name: TaskConvention(name, raw) for name, raw in filesystem["version_convention"].items()}
+
+    shotgrid_conventions = config.get("shotgrid", {}).get("version_convention", {})
+    for name, template in shotgrid_conventions.items():
+        template_fields(template, {"SHOT_CODE", "VERSION_NUMBER"}, f"shotgrid.version_convention of task {name}")
+    for name in config.get("task_names", []):
+        if name not in conventions:
+            raise ValueError(f"Task {name} has no filesystem.version_convention")
+        if name not in shotgrid_conventions:
+            raise ValueError(f"Task {name} has no shotgrid.version_convention")
+    return MappingProxyType(conventions)
@@ -0,0 +1,13 @@
+import sqlite3
+from contextlib import contextmanager
+
+@contextmanager
+def connect(path):
+    """Open a SQLite database shared between threads and ComfyUI processes, closing it afterwards"""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+    finally:
+        conn.close()
@@ -1,8 +1,16 @@
 import os
 import re
-import shutil
+import threading
+from functools import partial
 
-from .config import filesystem_config
+from .config import filesystem_config, get_convention
+from .transfer import copy_files, get_copy_workers, publish_file, summarize_methods
+from .manifest import Deduper, find_previous_manifest, hash_file, write_manifest
+from .metrics import metrics
+from .staging import StagedPublish
+from .storage import COMPRESSED_SUFFIX, DEFAULT_COMPRESSION_LEVEL, STORAGE_MANIFEST_SUFFIX, compress_data, compress_file, compressed_name, require_zstandard, write_storage_manifest
+from .stream import DEFAULT_PROXY_EXTENSION, ProxyEncoder, stream_frames, write_data
+from .validate import DEFAULT_VALIDATE_WORKERS, validate_frames
 
 # If you call ensure_image_sequence from this file, the logic already expects a directory.
 # No changes needed here, but make sure your publish_asset.py uses the updated image_sequence_dir logic as above.
@@ -16,6 +24,13 @@ def sanitize_path(path):
         return path[1:-1]
     return path
 
+def get_task_setting(task_name, key, default=None):
+    """Look up a publish setting on the task convention, falling back to the filesystem-wide value"""
+    settings = get_convention(task_name).settings
+    if key in settings:
+        return settings[key]
+    return filesystem_config.get(key, default)
+
 def get_output_dir(shot_code):
     output_dir = filesystem_config["output_dir"]
     seq_code = shot_code[:-4]
@@ -25,153 +40,207 @@ def get_output_dir(shot_code):
     return output_dir_path
 
 def get_task_dir(output_dir, task_name):
-    task_dir = filesystem_config["version_convention"][task_name]["parent_dir"]
-    task_dir_path = os.path.join(output_dir, *task_dir)
+    task_dir_path = os.path.join(output_dir, *get_convention(task_name).parent_dir)
     os.makedirs(task_dir_path, exist_ok=True)
     return task_dir_path
 
-def format_string_to_version_regex(format_string):
-    # Escape regex special characters except for the {VERSION_NUMBER} placeholder
-    regex = re.escape(format_string)
-    # Replace the escaped placeholder with a regex group to capture the version number
-    regex = regex.replace(r'\{VERSION_NUMBER\}', r'(\d{3})')
-    # Anchor the regex to match the full string
-    regex = f'^{regex}$'
-    return re.compile(regex)
-
-
-def get_next_version(task_name, task_dir):
-    version_numbers = []
-    version_dir = filesystem_config["version_convention"][task_name]["version_dir"]
-    if version_dir:
-        version_regex = format_string_to_version_regex(version_dir)
-        for f in os.listdir(task_dir):
-            if os.path.isdir(os.path.join(task_dir, f)):
-                match = version_regex.match(f)
-                if match:
-                    version_numbers.append(int(match.group(1)))
-    else:
-        version_pattern = re.compile(r"_v(\d{3})$")
-        for f in os.listdir(task_dir):
-            if os.path.isfile(os.path.join(task_dir, f)):
-                base, _ = os.path.splitext(f)
-                match = version_pattern.search(base)
-                if match:
-                    version_numbers.append(int(match.group(1)))
-    if len(version_numbers) == 0:
-        return "001"
-    else:
-        return str(max(version_numbers) + 1).zfill(3)
+FILE_VERSION_PATTERN = re.compile(r"_v(\d{3})$")
+
+# Hidden folder of a task directory holding one empty marker per reserved version
+RESERVED_DIR = ".reserved"
 
-def get_version_dir(task_name, task_dir, version_number):
-    version_dir = filesystem_config["version_convention"][task_name]["version_dir"]
-    if version_dir is None:
-        return task_dir
+# (task_dir, convention) -> ((task_dir mtime, reserved dir mtime), latest version number).
+# Keyed on the compiled convention, so a reloaded config.json starts with a fresh index.
+_version_index = {}
+_version_index_lock = threading.Lock()
+
+def _scan_latest_version(task_name, task_dir):
+    """Highest version published or reserved in a task directory, in one pass over each directory"""
+    version_numbers = [0]
+    convention = get_convention(task_name)
+    reservation_regex = convention.reservation_regex
+    if convention.version_dir:
+        version_regex = reservation_regex
+        for entry in os.scandir(task_dir):
+            match = version_regex.match(entry.name)
+            if match and entry.is_dir():
+                version_numbers.append(int(match.group(1)))
     else:
-        version_dir = version_dir.format(VERSION_NUMBER=version_number)
-        version_dir_path = os.path.join(task_dir, version_dir)
-        os.makedirs(version_dir_path, exist_ok=True)
-        return version_dir_path
-    
+        for entry in os.scandir(task_dir):
+            name = entry.name[:-len(COMPRESSED_SUFFIX)] if entry.name.endswith(COMPRESSED_SUFFIX) else entry.name
+            match = FILE_VERSION_PATTERN.search(os.path.splitext(name)[0])
+            if match and entry.is_file():
+                version_numbers.append(int(match.group(1)))
+    reserved_dir = os.path.join(task_dir, RESERVED_DIR)
+    if os.path.isdir(reserved_dir):
+        for entry in os.scandir(reserved_dir):
+            match = reservation_regex.match(entry.name)
+            if match:
+                version_numbers.append(int(match.group(1)))
+    return max(version_numbers)
+
+def _reservation_regex(task_name):
+    return get_convention(task_name).reservation_regex
+
+def _reservation_name(task_name, version_number):
+    return get_convention(task_name).reservation_name(version_number)
+
+def _dir_stamp(task_dir, reserved_dir):
+    return (os.stat(task_dir).st_mtime_ns, os.stat(reserved_dir).st_mtime_ns)
+
+def reserve_next_version(task_name, task_dir):
+    """Atomically claim the next version number of a task directory.
+
+    The claim is an exclusively created marker in the task's .reserved folder, so two
+    processes publishing the same shot and task never get the same number. The latest
+    number is cached per directory and only rescanned when either directory's mtime changes.
+    """
+    reserved_dir = os.path.join(task_dir, RESERVED_DIR)
+    os.makedirs(reserved_dir, exist_ok=True)
+    key = (task_dir, get_convention(task_name))
+    with _version_index_lock:
+        stamp = _dir_stamp(task_dir, reserved_dir)
+        cached = _version_index.get(key)
+        if cached is not None and cached[0] == stamp:
+            latest = cached[1]
+        else:
+            latest = _scan_latest_version(task_name, task_dir)
+        while True:
+            version_number = str(latest + 1).zfill(3)
+            try:
+                fd = os.open(os.path.join(reserved_dir, _reservation_name(task_name, version_number)), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                # Reserved by another process since the index was cached
+                latest += 1
+                continue
+            os.close(fd)
+            break
+        _version_index[key] = (_dir_stamp(task_dir, reserved_dir), latest + 1)
+    return version_number
+
 def get_file_name(kind, shot_code, task_name, version_number, frame_number=None):
-    file_name = filesystem_config["version_convention"][task_name][kind]
-    return file_name.format(SHOT_CODE=shot_code, VERSION_NUMBER=version_number, FRAME_NUMBER=frame_number)
+    return get_convention(task_name).file_name(kind, shot_code, version_number, frame_number)
 
 def match_extension(task_name, is_original, file_path):
     kind = "original" if is_original else "proxy"
-    type = filesystem_config["version_convention"][task_name][kind]
-    print({
-        "task_name": task_name,
-        "kind": kind,
-        "type": type,
-        "file_path": file_path,
-    })
-    if type == "image":
-        supported_extensions = filesystem_config["version_convention"][task_name]["image_ext"]
-    elif type == "file":
-        supported_extensions = filesystem_config["version_convention"][task_name]["file_ext"]
-    else:
-        supported_extensions = filesystem_config["version_convention"][task_name]["movie_ext"]
+    convention = get_convention(task_name)
+    type = convention.original if is_original else convention.proxy
+    supported_extensions = convention.extensions[type]
     _, ext = os.path.splitext(file_path)
     ext = ext[1:].lower()
     if ext not in supported_extensions:
         raise ValueError(f"Unsupported {kind} file extension: {ext} for {task_name} task. Must be {', '.join(supported_extensions)}")
     return True
 
-def list_image_sequence_files(dir_path):
-    """List all EXR and PNG files in a directory"""
-    return [f for f in sorted(os.listdir(dir_path)) 
-            if f.lower().endswith((".exr", ".png"))]
-
-def get_frame_number_from_image_file(file_path):
-    """Get the frame number from an image file (EXR or PNG)"""
-    # get the last bit of the filename before the extension
-    base, _ = os.path.splitext(file_path)
-    base = base.rstrip("_")
-    frame_number = base.split("_")[-1]
-    return frame_number
-
-def get_file_extension_from_sequence(dir_path):
-    """Determine the file extension used in the sequence (EXR or PNG)"""
-    files = list_image_sequence_files(dir_path)
-    if not files:
-        return None
-    
-    # Get the extension of the first file
-    _, ext = os.path.splitext(files[0])
-    ext = ext.lower()
-    
-    # Verify all files have the same extension
-    for f in files:
-        _, f_ext = os.path.splitext(f)
-        if f_ext.lower() != ext:
+# <prefix><frame digits><optional trailing underscores>.<exr|png>, e.g. SHOT_0010_comp_1001.exr
+SEQUENCE_FILE_PATTERN = re.compile(r"^(?P<prefix>(?:.*\D)?)(?P<frame>\d+)(?P<suffix>_*)(?P<ext>\.(?:exr|png))$", re.IGNORECASE)
+
+class ImageSequence:
+    """Compact description of an image sequence: file naming, frame range, padding and gaps.
+
+    Frame paths are rebuilt from the naming on demand instead of keeping one string per frame.
+    """
+    __slots__ = ("dir_path", "prefix", "suffix", "extension", "padding", "start", "end", "count", "gaps", "offset")
+
+    def __init__(self, dir_path, prefix, suffix, extension, padding, start, end, count, gaps):
+        self.dir_path = dir_path
+        self.prefix = prefix
+        self.suffix = suffix
+        self.extension = extension
+        self.padding = padding
+        self.start = start
+        self.end = end
+        self.count = count
+        # Missing (first, last) frame ranges, empty for a consecutive sequence
+        self.gaps = gaps
+        # Added to source frame numbers to get the published frame numbers
+        self.offset = 0
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"ImageSequence({os.path.join(self.dir_path, self.prefix)}[{self.start}-{self.end}]{self.suffix}{self.extension}, padding={self.padding}, gaps={self.gaps})"
+
+    def frame_path(self, frame):
+        return os.path.join(self.dir_path, f"{self.prefix}{str(frame).zfill(self.padding)}{self.suffix}{self.extension}")
+
+    def frames(self):
+        missing = set()
+        for first, last in self.gaps:
+            missing.update(range(first, last + 1))
+        return (frame for frame in range(self.start, self.end + 1) if frame not in missing)
+
+    def items(self):
+        """(published frame number, source path) pairs, like the dict the scanner used to build"""
+        return ((str(frame + self.offset).zfill(5), self.frame_path(frame)) for frame in self.frames())
+
+def scan_image_sequence(dir_path):
+    """Describe the EXR or PNG sequence in a directory with a single os.scandir pass.
+
+    Returns None if the directory holds no EXR or PNG files. Raises ValueError if the files do
+    not form one sequence (mixed extensions, different names or mixed frame padding).
+    """
+    prefix = suffix = extension = None
+    padding = None
+    start = end = None
+    count = 0
+    frames = []
+    for entry in os.scandir(dir_path):
+        name = entry.name
+        if not name.lower().endswith((".exr", ".png")):
+            continue
+        match = SEQUENCE_FILE_PATTERN.match(name)
+        if match is None:
+            raise ValueError(f"Image file {name} in {dir_path} has no frame number")
+        frame_digits = match.group("frame")
+        if extension is None:
+            prefix, suffix, extension, padding = match.group("prefix"), match.group("suffix"), match.group("ext"), len(frame_digits)
+        elif match.group("ext").lower() != extension.lower():
             raise ValueError(f"Mixed file extensions found in {dir_path}. All files must be either EXR or PNG.")
-    
-    return ext
+        elif match.group("prefix") != prefix or match.group("suffix") != suffix:
+            raise ValueError(f"More than one image sequence found in {dir_path}")
+        elif len(frame_digits) != padding:
+            raise ValueError(f"Frame numbers of image files are not of the same length in {dir_path}")
+        frame = int(frame_digits)
+        frames.append(frame)
+        count += 1
+        if start is None or frame < start:
+            start = frame
+        if end is None or frame > end:
+            end = frame
+    if count == 0:
+        return None
+    gaps = []
+    if count != end - start + 1:
+        present = set(frames)
+        gap_start = None
+        for frame in range(start, end + 1):
+            if frame not in present:
+                if gap_start is None:
+                    gap_start = frame
+            elif gap_start is not None:
+                gaps.append((gap_start, frame - 1))
+                gap_start = None
+    return ImageSequence(dir_path, prefix, suffix, extension, padding, start, end, count, gaps)
 
 def ensure_image_sequence(dir_path):
     """Ensure a valid image sequence exists (EXR or PNG files)"""
-    image_files = list_image_sequence_files(dir_path)
-    if len(image_files) == 0:
+    sequence = scan_image_sequence(dir_path)
+    if sequence is None:
         raise ValueError(f"No EXR or PNG files found in {dir_path}")
 
-    # Verify consistent extension
-    file_ext = get_file_extension_from_sequence(dir_path)
-    
-    # Filter files to only include those with the detected extension
-    image_files = [f for f in image_files if f.lower().endswith(file_ext)]
-
-    frame_numbers = [get_frame_number_from_image_file(f) for f in image_files]
-    
-    # Ensure all frame numbers are the same length
-    if len(set(len(f) for f in frame_numbers)) > 1:
-        raise ValueError(f"Frame numbers of image files are not of the same length in {dir_path}")
-
     # Ensure all frame numbers are consecutive
-    frame_numbers_int = [int(f) for f in frame_numbers]
-    start = frame_numbers_int[0]
-    for idx, num in enumerate(frame_numbers_int):
-        if num != start + idx:
-            raise ValueError(f"Frame numbers of image files are not consecutive in {dir_path}")
+    if sequence.gaps:
+        raise ValueError(f"Frame numbers of image files are not consecutive in {dir_path}")
             
     # --- NEW: Logic to enforce start frame of 1001 ---
-    frame_offset = 0 # Default to no offset
-    original_start_frame = frame_numbers_int[0]
-
     # Check if the start frame is outside the exception range (101-999)
-    if not (100 < original_start_frame < 1000):
+    if not (100 < sequence.start < 1000):
         # If it is, calculate the offset needed to move the start to 1001
-        frame_offset = 1001 - original_start_frame
+        sequence.offset = 1001 - sequence.start
         
-    # --- Apply the offset to generate the final frame dictionary ---
-    output_frames = {}
-    for i, original_frame in enumerate(frame_numbers_int):
-        # Calculate the new frame number
-        new_frame = original_frame + frame_offset
-        # Create the new dictionary entry with the corrected frame number
-        output_frames[str(new_frame).zfill(5)] = os.path.join(dir_path, image_files[i])
-        
-    return output_frames, file_ext
+    return sequence, sequence.extension.lower()
 
 def mime_type_from_file_path(file_path):
     _, ext = os.path.splitext(file_path)
@@ -191,80 +260,186 @@ def mime_type_from_file_path(file_path):
     else:
         return "application/octet-stream"
     
-def create_task_version(shot_code, task_name, original_file_path, proxy_file_path=None):
+def create_task_version(shot_code, task_name, original_file_path, proxy_file_path=None, progress=None, on_reserved=None):
+    """Publish an asset as the next version of its task and return the shotgrid_data describing it.
+
+    on_reserved(shotgrid_data) is called once the version number and paths are known, before any
+    file is written, so the ShotGrid side of the publish can start alongside the copy.
+    """
     if original_file_path is None or not os.path.exists(original_file_path):
         raise FileNotFoundError(f"Original {original_file_path} not found")
     match_extension(task_name, True, original_file_path)
+    convention = get_convention(task_name)
     
     # Check if this task expects image sequences (EXR or PNG)
-    image_sequence_task = False
-    if "image_ext" in filesystem_config["version_convention"][task_name]:
-        supported_exts = filesystem_config["version_convention"][task_name]["image_ext"]
-        # Check if either exr or png is in the supported extensions
-        image_sequence_task = any(ext in supported_exts for ext in ["exr", "png"])
+    image_sequence_task = convention.image_sequence
     
     image_files = None
     detected_ext = None
     if image_sequence_task:
-        image_files, detected_ext = ensure_image_sequence(os.path.dirname(original_file_path))
+        with metrics.span("fs.scan", task=task_name) as span:
+            image_files, detected_ext = ensure_image_sequence(os.path.dirname(original_file_path))
+            span.set(frames=len(image_files))
+        # Only frame headers are read, so a damaged sequence fails before a version is reserved
+        if get_task_setting(task_name, "validate_frames", True):
+            with metrics.span("fs.validate", task=task_name) as span:
+                validate_frames((path for _, path in image_files.items()), workers=max(1, int(filesystem_config.get("validate_workers", DEFAULT_VALIDATE_WORKERS))))
+                span.set(frames=len(image_files))
         
-    proxy_necessary = filesystem_config["version_convention"][task_name]["proxy"] is not None
-    if proxy_necessary and (proxy_file_path is None or not os.path.exists(proxy_file_path)):
+    # In single-read mode frames are read once, and a missing movie proxy is encoded from that read
+    single_read = image_sequence_task and get_task_setting(task_name, "single_read", False)
+    proxy_necessary = convention.proxy is not None
+    proxy_missing = proxy_file_path is None or not os.path.exists(proxy_file_path)
+    build_proxy = single_read and proxy_necessary and proxy_missing and convention.proxy == "movie"
+    if build_proxy:
+        encoder_settings = get_task_setting(task_name, "proxy_encoder", {})
+        proxy_ext = encoder_settings.get("extension", DEFAULT_PROXY_EXTENSION).lower()
+        if proxy_ext not in convention.extensions["movie"]:
+            raise ValueError(f"Unsupported proxy_encoder extension: {proxy_ext} for {task_name} task. Must be {', '.join(convention.extensions['movie'])}")
+    elif proxy_necessary and proxy_missing:
         raise FileNotFoundError(f"Proxy {proxy_file_path} not found")
-    if proxy_necessary:
+    elif proxy_necessary:
         match_extension(task_name, False, proxy_file_path)
 
+    # With compression, frames and originals are stored compressed; the movie sent to ShotGrid never is
+    compression = get_task_setting(task_name, "compression", "none")
+    compression_level = get_task_setting(task_name, "compression_level", DEFAULT_COMPRESSION_LEVEL)
+    if compression != "none":
+        require_zstandard()
+
     output_dir = get_output_dir(shot_code)
     task_dir = get_task_dir(output_dir, task_name)
-    new_version_number = get_next_version(task_name, task_dir)
-    version_dir = get_version_dir(task_name, task_dir, new_version_number)
 
-    output_file = None
-    image_dir = None
+    # Files are written into a staging folder and moved into place once all are published. A retry
+    # of the same publish takes over the staged version and only writes what is missing or changed.
+    publish_key = {
+        "shot_code": shot_code,
+        "task_name": task_name,
+        "original": os.path.abspath(os.path.dirname(original_file_path) if image_sequence_task else original_file_path),
+        "proxy": os.path.abspath(proxy_file_path) if proxy_necessary and not build_proxy else None,
+        "compression": compression,
+    }
+    with metrics.span("fs.reserve_version", task=task_name) as span:
+        staged = StagedPublish.find(task_dir, publish_key)
+        resumed = staged is not None
+        if staged is None:
+            new_version_number = reserve_next_version(task_name, task_dir)
+            staged = StagedPublish(task_dir, _reservation_name(task_name, new_version_number), new_version_number, publish_key)
+        else:
+            new_version_number = staged.version_number
+        span.set(resumed=bool(staged.done), staged_files=len(staged.done))
+        staged.start()
+    version_dir_name = convention.version_dir_name(new_version_number)
+    version_dir = os.path.join(task_dir, version_dir_name) if version_dir_name else task_dir
+    publish_mode = get_task_setting(task_name, "publish_mode", "copy")
+    publish_fn = partial(publish_file, mode=publish_mode)
+
+    # With dedupe, files are hashed into a manifest and unchanged ones are linked to the previous version
+    deduper = None
+    if get_task_setting(task_name, "dedupe", False):
+        previous_manifest = find_previous_manifest(task_dir, _reservation_regex(task_name), new_version_number)
+        deduper = Deduper(task_dir, previous_manifest, publish_fn)
+    dedupe_keys = {}
+
+    def publish_one(src, dst, key, fn=publish_fn):
+        if staged.is_done(key, src):
+            if deduper is not None:
+                deduper.record(dst, key, staged.done[key]["hash"] or hash_file(src), staged.done[key]["size"])
+            return "resume"
+        staged.discard(dst)
+        if deduper is None:
+            method = fn(src, dst)
+        else:
+            method = deduper.publish(src, dst, key, fn)
+        # The hash comes for free with dedupe, otherwise the source mtime vouches for the staged copy
+        staged.record(key, src, dst, deduper.entries[key]["hash"] if deduper is not None else None)
+        return method
 
+    # Name every output up front, so the version can be announced before anything is written
+    original_name = None
+    proxy_name = None
+    upload_path = None
     if image_sequence_task:
-        image_dir = version_dir
-        for frame_number, file_path in image_files.items():
-            # Use the detected extension for the output file
-            file_name = get_file_name("image", shot_code, task_name, new_version_number, frame_number) + detected_ext
-            shutil.copy(file_path, os.path.join(version_dir, file_name))
+        if build_proxy:
+            proxy_name = get_file_name("movie", shot_code, task_name, new_version_number) + f".{proxy_ext}"
     else:
-        type = filesystem_config["version_convention"][task_name]["original"]
-        file_name = get_file_name(type, shot_code, task_name, new_version_number) + os.path.splitext(original_file_path)[1].lower()
-        output_file = os.path.join(version_dir, file_name)
-        shutil.copy(original_file_path, output_file)
-    
-    if proxy_necessary:
-        type = filesystem_config["version_convention"][task_name]["proxy"]
-        file_name = get_file_name(type, shot_code, task_name, new_version_number) + os.path.splitext(proxy_file_path)[1].lower()
-        output_file = os.path.join(version_dir, file_name)
-        shutil.copy(proxy_file_path, output_file)
-    
+        original_name = get_file_name(convention.original, shot_code, task_name, new_version_number) + os.path.splitext(original_file_path)[1].lower()
+        upload_path = original_file_path
+    if proxy_necessary and not build_proxy:
+        proxy_name = get_file_name(convention.proxy, shot_code, task_name, new_version_number) + os.path.splitext(proxy_file_path)[1].lower()
+        upload_path = proxy_file_path
+    # {stored name: original name} of the files stored compressed
+    compressed = {}
+    compress_original = compression != "none" and original_name is not None and (proxy_name is not None or convention.original == "file")
+    if compress_original:
+        compressed[compressed_name(original_name)] = original_name
+        original_name = compressed_name(original_name)
+    movie_name = proxy_name or original_name
+    output_file = os.path.join(version_dir, movie_name) if movie_name else None
+
     shotgrid_data = {
         "version_number": new_version_number,
         "shot_code": shot_code,
         "task_name": task_name,
         "sg_path_to_movie": output_file,
-        "sg_path_to_frames": image_dir,
+        "sg_path_to_frames": version_dir if image_sequence_task else None,
         "mime_type": mime_type_from_file_path(output_file) if output_file else None,
+        # An interrupted attempt at this version may have created its ShotGrid version already
+        "resumed": resumed,
     }
+    if on_reserved is not None:
+        # upload_path holds the same bytes as sg_path_to_movie already, None if the movie is built while publishing
+        on_reserved(dict(shotgrid_data, upload_path=upload_path))
 
-    return shotgrid_data
-
-def create_blender_version(shot_code, original_file_path):
-    if original_file_path is None or not os.path.exists(original_file_path):
-        raise FileNotFoundError(f"Original file {original_file_path} is not found")
-    _, ext = os.path.splitext(original_file_path)
-    ext = ext[1:].lower()
-    if ext not in filesystem_config["version_convention"]["Blender Files"]["file_ext"]:
-        raise ValueError(f"Original {original_file_path} not a Blender file. File extension must be {', '.join(filesystem_config['version_convention']['Blender Files']['file_ext'])}")
+    methods = []
+    if image_sequence_task:
+        frame_copies = []
+        for frame_number, file_path in image_files.items():
+            # Use the detected extension for the output file
+            file_name = get_file_name("image", shot_code, task_name, new_version_number, frame_number) + detected_ext
+            if compression != "none":
+                compressed[compressed_name(file_name)] = file_name
+                file_name = compressed_name(file_name)
+            output_path = staged.path(file_name)
+            frame_copies.append((file_path, output_path))
+            dedupe_keys[output_path] = f"frame:{frame_number}"
+        with metrics.span("fs.publish_frames", task=task_name) as span:
+            if metrics.enabled:
+                span.add_bytes(sum(os.path.getsize(src) for src, _ in frame_copies))
+            # Frames are compressed one per thread, on every core
+            workers = max(get_copy_workers(), os.cpu_count() or 1) if compression != "none" else get_copy_workers()
+            if single_read:
+                encoder = None
+                if build_proxy:
+                    encoder = ProxyEncoder(staged.path(proxy_name), detected_ext[1:], encoder_settings, window=2 * workers)
+                write_fn = partial(compress_data, level=compression_level) if compression != "none" else write_data
+                methods.extend(stream_frames(frame_copies, dedupe_keys, deduper, encoder, progress, workers=workers, staged=staged, write_fn=write_fn))
+            else:
+                frame_fn = partial(compress_file, level=compression_level, threads=0) if compression != "none" else publish_fn
+                methods.extend(copy_files(frame_copies, workers=workers, progress=progress, copy_fn=lambda src, dst: publish_one(src, dst, dedupe_keys[dst], frame_fn)))
+            span.set(frames=len(frame_copies), publish_mode=summarize_methods(methods))
+    else:
+        with metrics.span("fs.publish_original", task=task_name) as span:
+            span.add_bytes(os.path.getsize(original_file_path))
+            original_fn = partial(compress_file, level=compression_level) if compress_original else publish_fn
+            methods.append(publish_one(original_file_path, staged.path(original_name), "original", original_fn))
     
-    output_dir = get_output_dir(shot_code)
-    task_dir = os.path.join(output_dir, os.path.join(*filesystem_config["version_convention"]["Blender Files"]["parent_dir"]))
-    new_version_number = get_next_version("Blender Files", task_dir)
-    version_dir = get_version_dir("Blender Files", task_dir, new_version_number)
-    os.makedirs(version_dir, exist_ok=True)
-
-    file_name = get_file_name("file", shot_code, "Blender Files", new_version_number) + os.path.splitext(original_file_path)[1].lower()
-    output_file = os.path.join(version_dir, file_name)
-    shutil.copy(original_file_path, output_file)
+    if proxy_necessary and not build_proxy:
+        with metrics.span("fs.publish_proxy", task=task_name) as span:
+            span.add_bytes(os.path.getsize(proxy_file_path))
+            methods.append(publish_one(proxy_file_path, staged.path(proxy_name), "proxy"))
+
+    if compressed:
+        write_storage_manifest(staged.path(_reservation_name(task_name, new_version_number) + STORAGE_MANIFEST_SUFFIX), compression, compression_level, compressed)
+
+    with metrics.span("fs.promote", task=task_name):
+        staged.promote(version_dir)
+
+    if deduper is not None:
+        # Entries were recorded at their staged paths
+        entries = {key: dict(entry, path=os.path.relpath(os.path.join(version_dir, os.path.basename(entry["path"])), task_dir)) for key, entry in deduper.entries.items()}
+        with metrics.span("fs.write_manifest", task=task_name):
+            write_manifest(task_dir, _reservation_name(task_name, new_version_number), new_version_number, entries)
+
+    shotgrid_data["publish_mode"] = summarize_methods(methods)
+    return shotgrid_data
@@ -0,0 +1,185 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# Statuses with which ShotGrid (or its storage) asks clients to slow down
+THROTTLE_STATUSES = (429, 503)
+
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_MAX_RATE = 50.0
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_RATE_INCREASE = 0.5
+DEFAULT_RATE_DECREASE = 0.5
+DEFAULT_MAX_RETRIES = 8
+DEFAULT_MAX_WAIT = 120.0
+
+def retry_after_seconds(response):
+    """Seconds a throttled response asks to wait, from its Retry-After header, or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class _HostLimit:
+    def __init__(self, rate):
+        self.rate = rate
+        self.in_flight = 0
+        # Earliest start of the next request, spacing requests 1/rate apart
+        self.next_at = 0.0
+        # No request starts before this, set from Retry-After
+        self.blocked_until = 0.0
+        self.decreased_at = 0.0
+        # (event loop, future) of coroutines waiting for a slot, woken when one is released
+        self.waiters = []
+
+class RateGovernor:
+    """Paces requests per host and backs off when the server throttles.
+
+    At most max_in_flight requests per host are in flight at once, started no faster than the
+    host's current rate. A 429 or 503 blocks the host for its Retry-After (or an exponential
+    backoff), halves the rate, and the request is sent again; every success raises the rate by
+    a fixed step up to max_rate. Several ComfyUI machines publishing at once thus settle on the
+    rate the site accepts instead of failing.
+    """
+    def __init__(self, settings):
+        self.max_in_flight = int(settings.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT))
+        self.max_rate = float(settings.get("max_rate", DEFAULT_MAX_RATE))
+        self.min_rate = float(settings.get("min_rate", DEFAULT_MIN_RATE))
+        self.increase = float(settings.get("rate_increase", DEFAULT_RATE_INCREASE))
+        self.decrease = float(settings.get("rate_decrease", DEFAULT_RATE_DECREASE))
+        self.max_retries = int(settings.get("max_retries", DEFAULT_MAX_RETRIES))
+        self.max_wait = float(settings.get("max_wait", DEFAULT_MAX_WAIT))
+        self._hosts = {}
+        self._cond = threading.Condition()
+
+    def rate(self, url):
+        """Current request rate allowed for the host of url"""
+        with self._cond:
+            limit = self._hosts.get(urlsplit(url).netloc)
+            return limit.rate if limit is not None else self.max_rate
+
+    def _reserve(self, host):
+        """Take an in-flight slot of host and its start time, or (limit, None) if every slot is taken. Call with _cond held"""
+        limit = self._hosts.get(host)
+        if limit is None:
+            limit = self._hosts[host] = _HostLimit(self.max_rate)
+        if limit.in_flight >= self.max_in_flight:
+            return limit, None
+        limit.in_flight += 1
+        start = max(time.monotonic(), limit.next_at)
+        limit.next_at = start + 1.0 / limit.rate
+        return limit, start
+
+    def _acquire(self, host):
+        with self._cond:
+            limit, start = self._reserve(host)
+            while start is None:
+                self._cond.wait()
+                limit, start = self._reserve(host)
+        while True:
+            # A throttled response may block the host while this request waits its turn
+            delay = max(start, limit.blocked_until) - time.monotonic()
+            if delay <= 0:
+                return limit, time.monotonic()
+            time.sleep(delay)
+
+    async def _acquire_async(self, host):
+        """_acquire for the event loop: waits for a released slot on a future and for its turn with asyncio.sleep"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                limit, start = self._reserve(host)
+                if start is not None:
+                    break
+                waiter = loop.create_future()
+                limit.waiters.append((loop, waiter))
+            await waiter
+        while True:
+            delay = max(start, limit.blocked_until) - time.monotonic()
+            if delay <= 0:
+                return limit, time.monotonic()
+            await asyncio.sleep(delay)
+
+    def _release(self, limit, started, succeeded=True, wait=None):
+        with self._cond:
+            limit.in_flight -= 1
+            now = time.monotonic()
+            if succeeded:
+                limit.rate = min(self.max_rate, limit.rate + self.increase)
+            elif wait is not None:
+                limit.blocked_until = max(limit.blocked_until, now + wait)
+                # Requests sent together are throttled together; slow down once per burst
+                if started >= limit.decreased_at:
+                    limit.rate = max(self.min_rate, limit.rate * self.decrease)
+                    limit.decreased_at = now
+                limit.next_at = max(limit.next_at, limit.blocked_until)
+            self._cond.notify_all()
+            # Releases come from threads and other loops too, so futures are resolved on their own loop
+            waiters, limit.waiters = limit.waiters, []
+        for loop, waiter in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, waiter)
+
+    def _backoff(self, response, attempt):
+        wait = retry_after_seconds(response)
+        if wait is None:
+            wait = 2 ** attempt + random.uniform(0, 1)
+        return min(wait, self.max_wait)
+
+    def request(self, url, send, rewind=None):
+        """Call send() for a request to url within the host's limits and return its response.
+
+        Throttled responses are retried after the wait they ask for, calling rewind() first to
+        reset a streamed body. The last throttled response is returned once retries run out.
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            limit, started = self._acquire(host)
+            try:
+                response = send()
+            except BaseException:
+                self._release(limit, started, succeeded=False)
+                raise
+            if response.status_code not in THROTTLE_STATUSES:
+                self._release(limit, started)
+                return response
+            self._release(limit, started, succeeded=False, wait=self._backoff(response, attempt))
+            if attempt == self.max_retries:
+                return response
+            if rewind is not None:
+                rewind()
+        return response
+
+    async def request_async(self, url, send, rewind=None):
+        """request() for coroutines: awaits send() for a response with status_code and headers"""
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            limit, started = await self._acquire_async(host)
+            try:
+                response = await send()
+            except BaseException:
+                self._release(limit, started, succeeded=False)
+                raise
+            if response.status_code not in THROTTLE_STATUSES:
+                self._release(limit, started)
+                return response
+            self._release(limit, started, succeeded=False, wait=self._backoff(response, attempt))
+            if attempt == self.max_retries:
+                return response
+            if rewind is not None:
+                rewind()
+        return response
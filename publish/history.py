@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import time
+
+from .config import config, resolve_path
+from .db import connect
+from .fs import sanitize_path, scan_image_sequence
+
+def _sequence_dir(path):
+    """Folder of the image sequence a publish reads, or None if it publishes a single file"""
+    if os.path.isdir(path):
+        return path
+    if path.lower().endswith((".exr", ".png")):
+        return os.path.dirname(path)
+    return None
+
+def source_signature(path):
+    """Size and mtime of a source file, or a digest of those of every frame for an image sequence"""
+    path = sanitize_path(path)
+    if not path or not os.path.exists(path):
+        return None
+    sequence_dir = _sequence_dir(path)
+    if sequence_dir is None:
+        stat = os.stat(path)
+        return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    sequence = scan_image_sequence(sequence_dir)
+    if sequence is None:
+        return {"path": os.path.abspath(sequence_dir), "frames": 0}
+    digest = hashlib.blake2b()
+    for frame in sequence.frames():
+        stat = os.stat(sequence.frame_path(frame))
+        digest.update(f"{frame}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return {"path": os.path.abspath(sequence_dir), "frames": len(sequence), "digest": digest.hexdigest()}
+
+def publish_fingerprint(kind, inputs, sources):
+    """Fingerprint of a publish: the node inputs that shape it plus the signature of each source file.
+
+    Options that do not change what gets published (e.g. force, run_in_background) must be left
+    out of inputs. Raises if a source is an invalid image sequence.
+    """
+    payload = {
+        "kind": kind,
+        "inputs": inputs,
+        "sources": [source_signature(path) for path in sources],
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=20).hexdigest()
+
+class PublishHistory:
+    """SQLite record of the publishes made, by fingerprint, so an unchanged re-run can report the existing version"""
+    def __init__(self, path):
+        self.path = path
+        with connect(self.path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS publishes (fingerprint TEXT PRIMARY KEY, kind TEXT, shot_code TEXT, task_name TEXT, version_number TEXT, result TEXT, published_at REAL)")
+
+    def get(self, fingerprint):
+        """Result recorded for a fingerprint, or None if it was never published or its files are gone"""
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT result FROM publishes WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        published_path = result.get("sg_path_to_frames") or result.get("sg_path_to_movie") or result.get("path")
+        if published_path and not os.path.exists(published_path):
+            return None
+        return result
+
+    def record(self, fingerprint, kind, result):
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO publishes (fingerprint, kind, shot_code, task_name, version_number, result, published_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, kind, result.get("shot_code"), result.get("task_name"), result.get("version_number"), json.dumps(result), time.time()),
+            )
+
+history_config = config.get("publish_history", {})
+history = PublishHistory(resolve_path(history_config.get("path", "publish_history.sqlite")))
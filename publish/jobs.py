@@ -0,0 +1,152 @@
+import json
+import queue
+import threading
+import time
+import uuid
+
+from .config import config, resolve_path
+from .db import connect
+
+DEFAULT_QUEUE_WORKERS = 2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class Job:
+    """A queued unit of work. state holds the checkpoints a handler records to resume after a restart"""
+    def __init__(self, job_id, kind, params, state=None, journal=None):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.state = state or {}
+        self._journal = journal
+
+    def checkpoint(self, **values):
+        """Record progress so a restarted job can skip the stages it already finished"""
+        self.state.update(values)
+        if self._journal is not None:
+            self._journal.update(self.id, state=self.state)
+
+class Journal:
+    """Durable SQLite record of every job and its checkpoints"""
+    def __init__(self, path):
+        self.path = path
+        with connect(self.path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT, params TEXT, state TEXT, status TEXT, error TEXT, created_at REAL, updated_at REAL)")
+
+    def insert(self, job):
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, state, status, error, created_at, updated_at) VALUES (?, ?, ?, ?, ?, NULL, ?, ?)",
+                (job.id, job.kind, json.dumps(job.params), json.dumps(job.state), PENDING, now, now),
+            )
+
+    def update(self, job_id, status=None, state=None, error=None):
+        columns = {"updated_at": time.time()}
+        if status is not None:
+            columns["status"] = status
+            columns["error"] = error
+        if state is not None:
+            columns["state"] = json.dumps(state)
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with connect(self.path) as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+
+    def get(self, job_id):
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT id, kind, params, state, status, error, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "params": json.loads(row[2]),
+            "state": json.loads(row[3]),
+            "status": row[4],
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def unfinished(self):
+        """Jobs that were pending or interrupted mid-run, oldest first"""
+        with connect(self.path) as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (PENDING, RUNNING)).fetchall()
+        return [row[0] for row in rows]
+
+class JobQueue:
+    """Runs jobs on a local worker pool, journaling them so unfinished jobs resume after a restart.
+
+    A journal must only be drained by one ComfyUI instance; give each instance its own journal_path.
+    """
+    def __init__(self, journal, workers):
+        self.journal = journal
+        self.workers = max(1, workers)
+        self._handlers = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def register(self, kind, handler):
+        """handler(job) runs a job of this kind; it may call job.checkpoint() between stages"""
+        self._handlers[kind] = handler
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for job_id in self.journal.unfinished():
+                self._queue.put(job_id)
+            for idx in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"publish-queue-{idx}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind, params):
+        """Journal a new job and queue it, returning its id"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for {kind} jobs")
+        job = Job(uuid.uuid4().hex, kind, params)
+        self.journal.insert(job)
+        self.start()
+        self._queue.put(job.id)
+        return job.id
+
+    def retry(self, job_id):
+        """Queue a failed job again; it resumes from its last checkpoint"""
+        record = self.journal.get(job_id)
+        if record is None:
+            raise ValueError(f"Job {job_id} not found")
+        if record["status"] != FAILED:
+            raise ValueError(f"Job {job_id} is {record['status']}, only failed jobs can be retried")
+        self.journal.update(job_id, status=PENDING)
+        self.start()
+        self._queue.put(job_id)
+
+    def get(self, job_id):
+        return self.journal.get(job_id)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            record = self.journal.get(job_id)
+            if record is None or record["status"] not in (PENDING, RUNNING):
+                continue
+            job = Job(record["id"], record["kind"], record["params"], record["state"], self.journal)
+            self.journal.update(job.id, status=RUNNING)
+            try:
+                self._handlers[job.kind](job)
+            except Exception as e:
+                print(f"Publish job {job.id} failed: {e}")
+                self.journal.update(job.id, status=FAILED, error=str(e))
+            else:
+                self.journal.update(job.id, status=DONE)
+
+queue_config = config.get("publish_queue", {})
+publish_queue = JobQueue(
+    Journal(resolve_path(queue_config.get("journal_path", "publish_jobs.sqlite"))),
+    int(queue_config.get("workers", DEFAULT_QUEUE_WORKERS)),
+)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+
+# Hidden folder of a task directory holding one manifest per published version
+MANIFEST_DIR = ".manifests"
+
+HASH_ALGORITHM = "blake2b"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def hash_file(path):
+    """Content hash of a file, read in large chunks"""
+    digest = hashlib.new(HASH_ALGORITHM)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_bytes(data):
+    return hashlib.new(HASH_ALGORITHM, data).hexdigest()
+
+class _HashingReader:
+    def __init__(self, f, content_hash):
+        self.f = f
+        self.content_hash = content_hash
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.content_hash.update(data)
+        return data
+
+class ContentHash:
+    """Hash of the bytes read through reader(f), so a copy hashes its source in the same pass"""
+    def __init__(self):
+        self._digest = hashlib.new(HASH_ALGORITHM)
+        self.size = 0
+
+    def reader(self, f):
+        return _HashingReader(f, self)
+
+    def update(self, data):
+        self._digest.update(data)
+        self.size += len(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+def write_manifest(task_dir, name, version_number, entries):
+    """Record the content hash of every file of a version, replacing the manifest atomically"""
+    manifest_dir = os.path.join(task_dir, MANIFEST_DIR)
+    os.makedirs(manifest_dir, exist_ok=True)
+    path = os.path.join(manifest_dir, f"{name}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version_number": version_number, "hash_algorithm": HASH_ALGORITHM, "files": entries}, f, indent=1)
+    os.replace(tmp_path, path)
+    return path
+
+def find_previous_manifest(task_dir, name_regex, version_number):
+    """Manifest of the latest version before version_number, or None if there is none"""
+    manifest_dir = os.path.join(task_dir, MANIFEST_DIR)
+    if not os.path.isdir(manifest_dir):
+        return None
+    latest = None
+    for entry in os.scandir(manifest_dir):
+        stem, ext = os.path.splitext(entry.name)
+        match = name_regex.match(stem)
+        if ext == ".json" and match and int(match.group(1)) < int(version_number):
+            if latest is None or int(match.group(1)) > latest[0]:
+                latest = (int(match.group(1)), entry.path)
+    if latest is None:
+        return None
+    try:
+        with open(latest[1], "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("hash_algorithm") != HASH_ALGORITHM:
+        return None
+    return manifest
+
+class Deduper:
+    """Publishes files, hardlinking the ones whose content is unchanged since the previous version.
+
+    Files are matched to the previous manifest by key (e.g. the published frame number), so a
+    republish of a sequence with a few changed frames only writes those frames.
+    """
+    def __init__(self, task_dir, previous_manifest, publish_fn):
+        self.task_dir = task_dir
+        self.previous = previous_manifest["files"] if previous_manifest else {}
+        self.publish_fn = publish_fn
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def publish(self, src, dst, key, publish_fn=None):
+        """Link src from the previous version if unchanged, otherwise write it with publish_fn(src, dst, digest=ContentHash).
+
+        A file that may be unchanged is hashed first, so linking it reads it once and writes nothing.
+        Any other file is hashed while publish_fn copies it, unless publish_fn never reads it in
+        userspace (e.g. a reflink), in which case it is hashed afterwards.
+        """
+        publish_fn = publish_fn or self.publish_fn
+        size = os.path.getsize(src)
+        previous = self.previous.get(key)
+        if previous is not None and previous["size"] == size:
+            digest = hash_file(src)
+            method = self._link_previous(dst, key, digest, size)
+            if method is None:
+                method = publish_fn(src, dst)
+        else:
+            content_hash = ContentHash()
+            method = publish_fn(src, dst, digest=content_hash)
+            digest = content_hash.hexdigest() if content_hash.size == size else hash_file(src)
+        self.record(dst, key, digest, size)
+        return method
+
+    def publish_data(self, data, dst, key, write_fn):
+        """Like publish, for a file already read into memory, which write_fn(dst, data) writes if it changed"""
+        digest = hash_bytes(data)
+        method = self._link_previous(dst, key, digest, len(data))
+        if method is None:
+            method = write_fn(dst, data)
+        self.record(dst, key, digest, len(data))
+        return method
+
+    def _link_previous(self, dst, key, digest, size):
+        previous = self.previous.get(key)
+        if previous is None or previous["hash"] != digest or previous["size"] != size:
+            return None
+        if os.path.splitext(previous["path"])[1] != os.path.splitext(dst)[1]:
+            # Same content stored differently, e.g. compressed in one version and not the other
+            return None
+        previous_path = os.path.join(self.task_dir, previous["path"])
+        try:
+            # A previous file edited in place since it was published no longer matches its manifest entry
+            stat = os.stat(previous_path)
+            if stat.st_size == previous.get("stored_size", size) and stat.st_mtime_ns == previous.get("mtime_ns"):
+                os.link(previous_path, dst)
+                return "dedupe"
+        except OSError:
+            # Previous file gone or not linkable (e.g. FAT/exFAT), publish normally
+            pass
+        return None
+
+    def record(self, dst, key, digest, size):
+        """Add a file to the manifest, e.g. one published by an earlier attempt"""
+        stat = os.stat(dst)
+        entry = {"path": os.path.relpath(dst, self.task_dir), "hash": digest, "size": size, "mtime_ns": stat.st_mtime_ns}
+        stored_size = stat.st_size
+        if stored_size != size:
+            # Stored compressed
+            entry["stored_size"] = stored_size
+        with self._lock:
+            self.entries[key] = entry
@@ -0,0 +1,223 @@
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+from .config import config, resolve_path
+
+# Seconds between rewrites of the Prometheus text file
+DEFAULT_FLUSH_INTERVAL = 10
+
+# Upper bounds, in seconds, of the span duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+METRIC_PREFIX = "movielabs_publish"
+
+class _NoopSpan:
+    """Stands in for a span when metrics are disabled, so instrumented code pays almost nothing"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def add_bytes(self, count):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def set_label(self, key, value):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+_span_ids = itertools.count(1)
+
+# Innermost open span, per thread and per asyncio task
+_current_span = contextvars.ContextVar("publish_metrics_span", default=None)
+
+class Span:
+    """A timed stage. Labels are aggregated into the Prometheus metrics, fields only go to the JSON lines"""
+    def __init__(self, metrics, name, labels):
+        self._metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.fields = {}
+        self.bytes = 0
+        self.span_id = f"{os.getpid():x}-{next(_span_ids):x}"
+        self.parent_id = None
+        self._token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is not None:
+            self.parent_id = parent.span_id
+        self._token = _current_span.set(self)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        self._metrics._record(self, duration, exc_val)
+        return False
+
+    def add_bytes(self, count):
+        self.bytes += count
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def set_label(self, key, value):
+        self.labels[key] = value
+
+class _Series:
+    __slots__ = ("count", "errors", "seconds", "bytes", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+class Metrics:
+    """Timing spans written as JSON lines and aggregated into a Prometheus text file.
+
+    Either path may be None. With neither, span() returns a shared no-op span.
+    The text file is meant for node_exporter's textfile collector and is rewritten
+    at most every flush_interval seconds, and once more at exit.
+    """
+    def __init__(self, events_path=None, textfile_path=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.events_path = events_path
+        self.textfile_path = textfile_path
+        self.flush_interval = flush_interval
+        self.enabled = bool(events_path or textfile_path)
+        self._series = {}
+        self._lock = threading.Lock()
+        self._events = None
+        self._flushed_at = 0.0
+        self._dirty = False
+
+    def span(self, name, **labels):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, labels)
+
+    def _record(self, span, duration, error):
+        status = "ok" if error is None else "error"
+        event = {
+            "span": span.name,
+            "id": span.span_id,
+            "parent": span.parent_id,
+            "start": round(span.started_at, 6),
+            "duration_s": round(duration, 6),
+            "status": status,
+            "thread": threading.current_thread().name,
+        }
+        event.update(span.labels)
+        if span.bytes:
+            event["bytes"] = span.bytes
+        if error is not None:
+            event["error"] = str(error)
+        event.update(span.fields)
+
+        key = (span.name, tuple(sorted((str(k), str(v)) for k, v in span.labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.count += 1
+            series.seconds += duration
+            series.bytes += span.bytes
+            if error is not None:
+                series.errors += 1
+            for idx, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    series.buckets[idx] += 1
+            self._dirty = True
+
+            if self.events_path:
+                try:
+                    if self._events is None:
+                        os.makedirs(os.path.dirname(self.events_path) or ".", exist_ok=True)
+                        self._events = open(self.events_path, "a", encoding="utf-8")
+                    self._events.write(json.dumps(event, default=str) + "\n")
+                    self._events.flush()
+                except OSError as e:
+                    print(f"Could not write publish metrics to {self.events_path}: {e}")
+
+            if self.textfile_path and time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._write_textfile()
+
+    def _render(self):
+        """Current aggregates in the Prometheus text exposition format, rendered with the lock held"""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_span_seconds Duration of publish stages and ShotGrid requests.",
+            f"# TYPE {METRIC_PREFIX}_span_seconds histogram",
+        ]
+        series = sorted(self._series.items())
+        for (name, labels), values in series:
+            base = [("span", name)] + list(labels)
+            for bound, count in zip(DURATION_BUCKETS, values.buckets):
+                lines.append(f"{METRIC_PREFIX}_span_seconds_bucket{_labels(base + [('le', repr(float(bound)))])} {count}")
+            lines.append(f"{METRIC_PREFIX}_span_seconds_bucket{_labels(base + [('le', '+Inf')])} {values.count}")
+            lines.append(f"{METRIC_PREFIX}_span_seconds_sum{_labels(base)} {values.seconds:.6f}")
+            lines.append(f"{METRIC_PREFIX}_span_seconds_count{_labels(base)} {values.count}")
+        lines.append(f"# HELP {METRIC_PREFIX}_span_errors_total Spans that ended with an exception.")
+        lines.append(f"# TYPE {METRIC_PREFIX}_span_errors_total counter")
+        for (name, labels), values in series:
+            lines.append(f"{METRIC_PREFIX}_span_errors_total{_labels([('span', name)] + list(labels))} {values.errors}")
+        lines.append(f"# HELP {METRIC_PREFIX}_bytes_total Bytes copied or uploaded by publish stages.")
+        lines.append(f"# TYPE {METRIC_PREFIX}_bytes_total counter")
+        for (name, labels), values in series:
+            if values.bytes:
+                lines.append(f"{METRIC_PREFIX}_bytes_total{_labels([('span', name)] + list(labels))} {values.bytes}")
+        return "\n".join(lines) + "\n"
+
+    def _write_textfile(self):
+        # Written to a temporary file and renamed, so the exporter never reads a partial file
+        try:
+            os.makedirs(os.path.dirname(self.textfile_path) or ".", exist_ok=True)
+            tmp_path = self.textfile_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self._render())
+            os.replace(tmp_path, self.textfile_path)
+        except OSError as e:
+            print(f"Could not write publish metrics to {self.textfile_path}: {e}")
+        self._flushed_at = time.monotonic()
+        self._dirty = False
+
+    def flush(self):
+        with self._lock:
+            if self.textfile_path and self._dirty:
+                self._write_textfile()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._events is not None:
+                self._events.close()
+                self._events = None
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(pairs):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+metrics_config = config.get("metrics", {})
+if metrics_config.get("enabled", False):
+    metrics = Metrics(
+        resolve_path(metrics_config["events_path"]) if metrics_config.get("events_path") else None,
+        resolve_path(metrics_config["textfile_path"]) if metrics_config.get("textfile_path") else None,
+        float(metrics_config.get("flush_interval", DEFAULT_FLUSH_INTERVAL)),
+    )
+else:
+    metrics = Metrics()
+atexit.register(metrics.close)
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import uuid
+
+# Seconds between two progress events of one publish; stage changes and the end are sent right away
+EVENT_INTERVAL = 0.25
+
+# Seconds a finished publish stays listed, so the UI can show how it ended
+FINISHED_TTL = 60
+
+class PublishProgress:
+    """Live state of one running publish: its stage, frames copied and movie bytes uploaded, with their rates.
+
+    copy_progress and upload_progress match the progress callbacks of copy_files and upload_movie.
+    """
+    def __init__(self, board, shot_code, task_name, job_id=None):
+        self.board = board
+        self.id = uuid.uuid4().hex[:12]
+        self.shot_code = shot_code
+        self.task_name = task_name
+        # Set for background publishes, which can be retried once failed
+        self.job_id = job_id
+        self.stage = "starting"
+        self.status = "running"
+        self.version_code = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.copy = {"done": 0, "total": 0, "bytes": 0, "rate": 0.0}
+        self.upload = {"sent": 0, "total": 0, "rate": 0.0}
+        self._copy_started = None
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage):
+        self.stage = stage
+        self.board.emit(self, force=True)
+
+    def copy_progress(self, done, total, src, dst):
+        try:
+            size = os.path.getsize(src)
+        except OSError:
+            size = 0
+        with self._lock:
+            now = time.monotonic()
+            if self._copy_started is None:
+                self._copy_started = now
+            self.copy["done"] = done
+            self.copy["total"] = total
+            self.copy["bytes"] += size
+            elapsed = now - self._copy_started
+            self.copy["rate"] = self.copy["bytes"] / elapsed if elapsed > 0 else 0.0
+        self.board.emit(self, force=done == total)
+
+    def upload_progress(self, sent, total, bytes_per_sec):
+        self.upload.update(sent=sent, total=total, rate=bytes_per_sec)
+        self.board.emit(self, force=sent == total)
+
+    def finish(self, version_code=None, error=None):
+        self.status = "failed" if error is not None else "done"
+        self.stage = self.status
+        self.version_code = version_code
+        self.error = str(error) if error is not None else None
+        self.finished_at = time.time()
+        self.board.emit(self, force=True)
+
+    def to_dict(self):
+        with self._lock:
+            copy = dict(self.copy)
+        return {
+            "id": self.id,
+            "shot_code": self.shot_code,
+            "task_name": self.task_name,
+            "job_id": self.job_id,
+            "stage": self.stage,
+            "status": self.status,
+            "version_code": self.version_code,
+            "error": self.error,
+            "started_at": self.started_at,
+            "copy": copy,
+            "upload": dict(self.upload),
+        }
+
+class ProgressBoard:
+    """Publishes running in this ComfyUI process, sent to listeners (the web UI) as they progress"""
+    def __init__(self):
+        self._publishes = {}
+        self._sent_at = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def start(self, shot_code, task_name, job_id=None):
+        progress = PublishProgress(self, shot_code, task_name, job_id)
+        with self._lock:
+            self._prune()
+            self._publishes[progress.id] = progress
+        self.emit(progress, force=True)
+        return progress
+
+    def subscribe(self, listener):
+        """Call listener(state dict) on every progress event, from the publishing thread"""
+        self._listeners.append(listener)
+
+    def snapshot(self):
+        with self._lock:
+            self._prune()
+            return [progress.to_dict() for progress in self._publishes.values()]
+
+    def _prune(self):
+        expired = time.time() - FINISHED_TTL
+        for publish_id, progress in list(self._publishes.items()):
+            if progress.finished_at is not None and progress.finished_at < expired:
+                del self._publishes[publish_id]
+                self._sent_at.pop(publish_id, None)
+
+    def emit(self, progress, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._sent_at.get(progress.id, 0.0) < EVENT_INTERVAL:
+                return
+            self._sent_at[progress.id] = now
+        state = progress.to_dict()
+        for listener in self._listeners:
+            try:
+                listener(state)
+            except Exception as e:
+                print(f"Could not send publish progress: {e}")
+
+progress_board = ProgressBoard()
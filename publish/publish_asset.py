@@ -1,7 +1,14 @@
 import os
-from .shotgrid import shots, artist_logins, ShotGrid
+from concurrent.futures import Future, ThreadPoolExecutor
+from .shotgrid import get_session, DEFAULT_PENDING_VERSION_STATUS, DEFAULT_PUBLISHED_VERSION_STATUS
+from .catalog import catalog
 from .config import shotgrid_config, task_names
-from .fs import create_task_version
+from .fs import create_task_version, scan_image_sequence
+from .upload import upload_movie
+from .jobs import Job, publish_queue
+from .history import history, publish_fingerprint
+from .metrics import metrics
+from .progress import progress_board
 
 def sanitize_path(path):
     if path is None:
@@ -19,89 +26,273 @@ class PublishAsset:
 
     @classmethod
     def INPUT_TYPES(cls):
-        artist_logins_with_blank = [""] + artist_logins
+        # Shots and artists are searched by the web UI instead of being listed here
         return {
             "required": {
-                "artist_login": (artist_logins_with_blank,),
-                "shot_code": (list(shots.keys()),),
+                "artist_login": ("STRING", {"default": "", "label": "Artist Login", "tooltip": "Your ShotGrid login"}),
+                "shot_code": ("STRING", {"default": "", "label": "Shot Code"}),
                 "task_name": (task_names,),
                 "original_asset_file_path": ("STRING", {"default": "", "label": "Original Asset File Path"}),
             },
             "optional": {
                 "proxy_asset_file_path": ("STRING", {"default": "", "label": "Proxy Asset File Path"}),
                 "notes": ("STRING", {"default": "", "multiline": True, "label": "Notes"}),
+                "run_in_background": ("BOOLEAN", {"default": False, "label": "Run In Background", "tooltip": "Queue the publish and return immediately. Queued publishes survive a ComfyUI restart."}),
+                "force": ("BOOLEAN", {"default": False, "label": "Force", "tooltip": "Publish a new version even if these inputs and files were already published"}),
             },
         }
 
-    def publish_asset(self, artist_login, shot_code, task_name, original_asset_file_path, proxy_asset_file_path=None, notes=""):
-        if not artist_login:
-            raise Exception("Select your artist login")
-        sg = ShotGrid(shotgrid_config, artist_login)
-
-        if shot_code not in shots:
-            raise Exception(f"Shot {shot_code} not found")
-
-        sg_tasks = sg.get_tasks(shot_code, task_name)
-        if not sg_tasks:
-            raise Exception(f"Task {task_name} not found for shot {shot_code}")
-
-        # Sanitize paths
-        clean_original_path = sanitize_path(original_asset_file_path)
-        clean_proxy_path = sanitize_path(proxy_asset_file_path)
-        
-        final_asset_path = None
-
-        # Logic to find  EXR or PNG file if a folder is given
-        if os.path.isdir(clean_original_path):
-            print(f"Searching for .exr/.png files in folder: {clean_original_path}")
-            # Prefer EXR, then PNG
-            exts_priority = [".exr", ".png"]
-            files = sorted(os.listdir(clean_original_path))
-        
-            for ext in exts_priority:
-                matches = [f for f in files if f.lower().endswith(ext)]
-                if matches:
-                    final_asset_path = os.path.join(clean_original_path, matches[0])
-                    print(f"Found file: {final_asset_path}")
-                    break
-        
-            if not final_asset_path:
-                raise FileNotFoundError(
-                    f"No .exr or .png files found in the specified folder: {clean_original_path}"
-                )
-        else:
-            # If a file path is passed directly, use it (supports .exr or .png)
-            final_asset_path = clean_original_path
-        
-        # Core publishing logic
-        shotgrid_data = create_task_version(shot_code, task_name, final_asset_path, clean_proxy_path)
-        version_code = sg.get_version_code(shot_code, task_name, shotgrid_data["version_number"])
-        
-        shotgrid_fields = {
-            "sg_notes": notes,
-            "sg_path_to_movie": shotgrid_data["sg_path_to_movie"],
-            "sg_path_to_frames": shotgrid_data["sg_path_to_frames"],
+    @classmethod
+    def IS_CHANGED(cls, artist_login, shot_code, task_name, original_asset_file_path, proxy_asset_file_path=None, notes="", run_in_background=False, force=False):
+        if force:
+            return float("NaN")
+        try:
+            original_asset_path(original_asset_file_path)
+            fingerprint = publish_fingerprint_of(shot_code, task_name, original_asset_file_path, proxy_asset_file_path, notes)
+        except Exception:
+            # Let the publish itself report what is wrong with the sources
+            return float("NaN")
+        # Until a publish of these inputs succeeded (e.g. a background job failed), the node must run again
+        if history.get(fingerprint) is None:
+            return float("NaN")
+        return fingerprint
+
+    def publish_asset(self, artist_login, shot_code, task_name, original_asset_file_path, proxy_asset_file_path=None, notes="", run_in_background=False, force=False):
+        catalog.require_artist(artist_login)
+        original_asset_path(original_asset_file_path)
+        fingerprint = publish_fingerprint_of(shot_code, task_name, original_asset_file_path, proxy_asset_file_path, notes)
+        if not force:
+            existing = history.get(fingerprint)
+            if existing is not None:
+                message = f"{existing['version_code']} was already published from these inputs and files, enable force to publish again"
+                print(message)
+                return {"ui": {"text": [message]}}
+        params = {
+            "artist_login": artist_login,
+            "shot_code": shot_code,
+            "task_name": task_name,
+            "original_asset_file_path": original_asset_file_path,
+            "proxy_asset_file_path": proxy_asset_file_path,
+            "notes": notes,
+            "fingerprint": fingerprint,
         }
-        
-        shot_id = shots[shot_code]["id"]
-        task_id = sg_tasks[0]["id"]
-        
-        # 1. Add version to ShotGrid
-        sg_version = sg.add_version(version_code, shot_id, task_id, shotgrid_fields)
-        
-        # Only upload movie if there is one (i.e., if proxy was provided)
-        if shotgrid_fields["sg_path_to_movie"] is not None:
-            # 2. Request upload URL
-            file_upload_data = sg.request_file_upload(sg_version["id"], "sg_uploaded_movie", shotgrid_fields["sg_path_to_movie"])
-            
-            # 3. Upload the file
-            sg.upload_file(file_upload_data["links"]["upload"], shotgrid_fields["sg_path_to_movie"], shotgrid_data["mime_type"])
-            
-            # 4. Mark upload as complete
-            sg.complete_file_upload(file_upload_data)
-        
+        if run_in_background:
+            job_id = publish_queue.submit(PUBLISH_JOB, params)
+            print(f"Queued publish job {job_id} for {shot_code} {task_name}")
+            return {"ui": {"text": [f"Queued publish job {job_id}"]}}
+
+        run_publish(Job(None, PUBLISH_JOB, params))
         return ()
 
+def original_asset_path(original_asset_file_path):
+    """File a publish reads its original from: the file given, or the first frame of the sequence in a folder"""
+    clean_original_path = sanitize_path(original_asset_file_path)
+    if not clean_original_path or not os.path.exists(clean_original_path):
+        raise FileNotFoundError(f"Original {clean_original_path} not found")
+
+    # Logic to find  EXR or PNG file if a folder is given
+    if os.path.isdir(clean_original_path):
+        sequence = scan_image_sequence(clean_original_path)
+        if sequence is None:
+            raise FileNotFoundError(
+                f"No .exr or .png files found in the specified folder: {clean_original_path}"
+            )
+        return sequence.frame_path(sequence.start)
+    # If a file path is passed directly, use it (supports .exr or .png)
+    return clean_original_path
+
+def publish_fingerprint_of(shot_code, task_name, original_asset_file_path, proxy_asset_file_path, notes):
+    """Fingerprint of a publish over its inputs and the size and mtime of its source files"""
+    inputs = {
+        "shot_code": shot_code,
+        "task_name": task_name,
+        "original_asset_file_path": original_asset_file_path,
+        "proxy_asset_file_path": proxy_asset_file_path or "",
+        "notes": notes or "",
+    }
+    return publish_fingerprint(PUBLISH_JOB, inputs, [original_asset_file_path, proxy_asset_file_path])
+
+def resolve_shot_task(sg, shot_code, task_name, live_tasks=None):
+    """ShotGrid ids of a shot and of its task, raising if either does not exist.
+
+    live_tasks optionally holds tasks already fetched with ShotGrid.get_tasks_for_shots.
+    """
+    shot = catalog.require_shot(shot_code, sg)
+
+    sg_tasks = catalog.get_tasks(shot_code, task_name)
+    if not sg_tasks:
+        # The shot or task may have been created since the catalog was last refreshed
+        if live_tasks is not None:
+            sg_tasks = live_tasks.get((shot_code, task_name))
+        else:
+            sg_tasks = sg.get_tasks(shot_code, task_name)
+    if not sg_tasks:
+        raise Exception(f"Task {task_name} not found for shot {shot_code}")
+    return shot["id"], sg_tasks[0]["id"]
+
+def write_version(params, on_reserved=None, progress=None):
+    """Write the asset files of a publish to the filesystem and return their shotgrid_data.
+
+    progress is an optional PublishProgress told about every frame written, and whether an
+    interrupted attempt is being resumed.
+    """
+    final_asset_path = original_asset_path(params["original_asset_file_path"])
+    clean_proxy_path = sanitize_path(params["proxy_asset_file_path"])
+    if final_asset_path != sanitize_path(params["original_asset_file_path"]):
+        print(f"Found file: {final_asset_path}")
+
+    def reserved(shotgrid_data):
+        if progress is not None and shotgrid_data["resumed"]:
+            progress.set_stage(f"resuming v{shotgrid_data['version_number']}")
+        if on_reserved is not None:
+            on_reserved(shotgrid_data)
+
+    # Core publishing logic
+    return create_task_version(params["shot_code"], params["task_name"], final_asset_path, clean_proxy_path, progress=progress.copy_progress if progress else None, on_reserved=reserved)
+
+def version_status(pending):
+    """sg_status_list of a version whose files are still being written (pending), or of a published one"""
+    if pending:
+        return shotgrid_config.get("pending_version_status", DEFAULT_PENDING_VERSION_STATUS)
+    return shotgrid_config.get("published_version_status", DEFAULT_PUBLISHED_VERSION_STATUS)
+
+def version_request(sg, job, shotgrid_data=None, pending=False):
+    """Version code and ShotGrid fields of a written (or, when pending, reserved) publish"""
+    params = job.params
+    shotgrid_data = shotgrid_data or job.state["shotgrid_data"]
+    version_code = sg.get_version_code(params["shot_code"], params["task_name"], shotgrid_data["version_number"])
+    
+    shotgrid_fields = {
+        "sg_notes": params["notes"],
+        "sg_path_to_movie": shotgrid_data["sg_path_to_movie"],
+        "sg_path_to_frames": shotgrid_data["sg_path_to_frames"],
+        "sg_status_list": version_status(pending),
+    }
+    return version_code, shotgrid_fields
+
+def register_version(sg, job, shot_id, task_id, shotgrid_data=None, files_written=None, progress=None):
+    """Create the ShotGrid version of a publish, unless already created, and upload its movie.
+
+    While the files are still being written, shotgrid_data is the reserved version and
+    files_written a Future of the write: the version is created pending and the movie sent from
+    its source file meanwhile. The upload is only completed, and the version marked published,
+    once the write succeeded.
+    """
+    shotgrid_data = shotgrid_data or job.state["shotgrid_data"]
+    version_code, shotgrid_fields = version_request(sg, job, shotgrid_data, pending=files_written is not None)
+    
+    # 1. Add version to ShotGrid
+    version_id = job.state.get("version_id")
+    if version_id is not None and job.state.get("version_number", shotgrid_data["version_number"]) != shotgrid_data["version_number"]:
+        # Created by an interrupted attempt whose files were then written under another version number
+        sg.delete_version(version_id)
+        version_id = None
+    if version_id is None and shotgrid_data.get("resumed"):
+        # A foreground publish keeps no journal; its interrupted attempt may have created the version already
+        sg_version = sg.find_version(version_code, task_id)
+        if sg_version is not None:
+            # Most likely still pending, it is marked published below once the files are written
+            version_id = sg_version["id"]
+            job.checkpoint(version_id=version_id, version_number=shotgrid_data["version_number"], version_pending=True)
+    if version_id is None:
+        with metrics.span("publish.add_version", task=job.params["task_name"]):
+            sg_version = sg.add_version(version_code, shot_id, task_id, shotgrid_fields)
+        version_id = sg_version["id"]
+        job.checkpoint(version_id=version_id, version_number=shotgrid_data["version_number"], version_pending=files_written is not None)
+    
+    # Only upload movie if there is one (i.e., if proxy was provided)
+    if shotgrid_fields["sg_path_to_movie"] is not None:
+        upload_path = shotgrid_fields["sg_path_to_movie"]
+        before_complete = None
+        if files_written is not None:
+            before_complete = files_written.result
+            if shotgrid_data["upload_path"] is not None:
+                upload_path = shotgrid_data["upload_path"]
+            else:
+                # The movie is being built from the frames, it can only be sent once written
+                files_written.result()
+        # 2. Upload the file (in parallel parts if it is large) and mark the upload as complete
+        with metrics.span("publish.upload", task=job.params["task_name"]) as span:
+            span.add_bytes(os.path.getsize(upload_path))
+            upload_movie(sg, version_id, "sg_uploaded_movie", upload_path, shotgrid_data["mime_type"], progress=progress.upload_progress if progress else None, before_complete=before_complete, file_name=shotgrid_fields["sg_path_to_movie"])
+
+    # 3. Publish the version once every file is written
+    if job.state.get("version_pending"):
+        if files_written is not None:
+            files_written.result()
+        sg.update_version(version_id, {"sg_status_list": version_status(False)})
+        job.checkpoint(version_pending=False)
+    return version_code
+
+def write_and_register(sg, job, shot_id, task_id, progress=None):
+    """Write the files of a publish while its ShotGrid version is created and its movie uploaded.
+
+    The filesystem stays the source of truth: the version stays pending and its upload
+    uncompleted until every file is written, and if writing fails the version is deleted. A
+    version left pending by a crash is reused when the publish is retried. A publish thus takes
+    about as long as the slower of the copy and the upload instead of both one after the other.
+    """
+    params = job.params
+    files_written = Future()
+    registration = []
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="publish-register") as sg_stage:
+        def on_reserved(shotgrid_data):
+            registration.append(sg_stage.submit(register_version, sg, job, shot_id, task_id, shotgrid_data, files_written, progress))
+
+        try:
+            with metrics.span("publish.write_version", task=params["task_name"]):
+                shotgrid_data = write_version(params, on_reserved=on_reserved, progress=progress)
+        except BaseException as e:
+            files_written.set_exception(e)
+            if registration:
+                # Wait for the ShotGrid stage to stop before removing what it created
+                registration[0].exception()
+                version_id = job.state.get("version_id")
+                if version_id is not None:
+                    try:
+                        sg.delete_version(version_id)
+                        job.checkpoint(version_id=None, version_number=None, version_pending=None)
+                    except Exception as delete_error:
+                        print(f"Could not delete ShotGrid version {version_id} of failed publish: {delete_error}")
+            raise
+        job.checkpoint(shotgrid_data=shotgrid_data)
+        files_written.set_result(shotgrid_data)
+        return registration[0].result()
+
+def record_publish(job, version_code):
+    """Remember a finished publish by its fingerprint, so the same inputs and files are not published again"""
+    if job.params.get("fingerprint"):
+        history.record(job.params["fingerprint"], PUBLISH_JOB, dict(job.state["shotgrid_data"], version_code=version_code))
+
+def run_publish(job):
+    """Publish an asset to the filesystem and ShotGrid, checkpointing each stage on the job"""
+    params = job.params
+    progress = progress_board.start(params["shot_code"], params["task_name"], job.id)
+    try:
+        with metrics.span("publish", task=params["task_name"]) as span:
+            span.set(shot_code=params["shot_code"], job_id=job.id)
+            with metrics.span("publish.session", task=params["task_name"]):
+                sg = get_session(shotgrid_config, params["artist_login"])
+            with metrics.span("publish.resolve", task=params["task_name"]):
+                shot_id, task_id = resolve_shot_task(sg, params["shot_code"], params["task_name"])
+            progress.set_stage("publishing")
+            if "shotgrid_data" not in job.state:
+                version_code = write_and_register(sg, job, shot_id, task_id, progress)
+            else:
+                version_code = register_version(sg, job, shot_id, task_id, progress=progress)
+            record_publish(job, version_code)
+            span.set(version_code=version_code, publish_mode=job.state["shotgrid_data"]["publish_mode"])
+    except BaseException as e:
+        progress.finish(error=e)
+        raise
+    progress.finish(version_code)
+    return version_code
+
+PUBLISH_JOB = "publish_asset"
+publish_queue.register(PUBLISH_JOB, run_publish)
+publish_queue.start()
+
 # Node mappings for ComfyUI
 NODE_CLASS_MAPPINGS = {
     "PublishAsset": PublishAsset,
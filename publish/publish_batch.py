@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .shotgrid import get_session, DEFAULT_BATCH_SIZE
+from .catalog import catalog
+from .config import shotgrid_config
+from .jobs import Job
+from .progress import progress_board
+from .publish_asset import PUBLISH_JOB, publish_fingerprint_of, record_publish, resolve_shot_task, write_version, version_request, register_version
+
+MANIFEST_COLUMNS = ("shot_code", "task_name", "original_asset_file_path", "proxy_asset_file_path", "notes")
+MANIFEST_ALIASES = {"original": "original_asset_file_path", "proxy": "proxy_asset_file_path"}
+
+def parse_manifest(text):
+    """Rows of a batch manifest: a JSON list of objects, or one CSV line per publish in MANIFEST_COLUMNS order"""
+    text = text.strip()
+    if not text:
+        return []
+    if text.startswith("["):
+        records = [{MANIFEST_ALIASES.get(key, key): value for key, value in record.items()} for record in json.loads(text)]
+    else:
+        records = []
+        for values in csv.reader(io.StringIO(text), skipinitialspace=True):
+            if not values or not "".join(values).strip() or values[0].lstrip().startswith("#"):
+                continue
+            records.append(dict(zip(MANIFEST_COLUMNS, values)))
+    rows = []
+    for idx, record in enumerate(records, start=1):
+        row = {column: (record.get(column) or "").strip() for column in MANIFEST_COLUMNS}
+        for column in MANIFEST_COLUMNS[:3]:
+            if not row[column]:
+                raise ValueError(f"Manifest row {idx} has no {column}")
+        rows.append(row)
+    return rows
+
+def publish_many(artist_login, rows):
+    """Publish manifest rows over one ShotGrid session, returning (row, version_code or exception) pairs.
+
+    Files are written by a filesystem stage while this thread runs the ShotGrid stage, so one
+    row's frames copy while the previous row's proxy uploads. Every row is checked against
+    ShotGrid before anything is copied, tasks missing from the catalog are looked up in one
+    search, and versions whose files are ready together are created in one _batch request.
+    Each row is then registered and recorded in the publish history like a single publish.
+    """
+    sg = get_session(shotgrid_config, artist_login)
+    results = [None] * len(rows)
+
+    catalog.require_shots()
+    # Includes the rows of shots missing from the catalog, which resolve_shot_task looks up live
+    uncached = [(row["shot_code"], row["task_name"]) for row in rows if not catalog.get_tasks(row["shot_code"], row["task_name"])]
+    live_tasks = sg.get_tasks_for_shots(uncached) if uncached else {}
+
+    jobs = []
+    progresses = {}
+    for idx, row in enumerate(rows):
+        job = Job(None, PUBLISH_JOB, dict(row, artist_login=artist_login))
+        try:
+            ids = resolve_shot_task(sg, row["shot_code"], row["task_name"], live_tasks)
+        except Exception as e:
+            results[idx] = (row, e)
+            continue
+        jobs.append((idx, job, ids))
+        progresses[idx] = progress_board.start(row["shot_code"], row["task_name"])
+
+    def write(idx, job):
+        progresses[idx].set_stage("publishing")
+        job.checkpoint(shotgrid_data=write_version(job.params, progress=progresses[idx]))
+        params = job.params
+        params["fingerprint"] = publish_fingerprint_of(params["shot_code"], params["task_name"], params["original_asset_file_path"], params["proxy_asset_file_path"], params["notes"])
+
+    batch_size = int(shotgrid_config.get("batch_size", DEFAULT_BATCH_SIZE))
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="publish-batch-fs") as fs_stage:
+        pending = deque((idx, job, ids, fs_stage.submit(write, idx, job)) for idx, job, ids in jobs)
+        while pending:
+            # Wait for the next row's files, then take every other row that is already written
+            pending[0][3].exception()
+            group = [pending.popleft()]
+            while pending and len(group) < batch_size and pending[0][3].done():
+                group.append(pending.popleft())
+
+            written = []
+            for idx, job, ids, future in group:
+                if future.exception() is not None:
+                    results[idx] = (rows[idx], future.exception())
+                else:
+                    written.append((idx, job, ids))
+            # A resumed row may have its version from an interrupted run already; register_version looks it up
+            new = [(idx, job, ids) for idx, job, ids in written if not job.state["shotgrid_data"].get("resumed")]
+            versions = []
+            for idx, job, (shot_id, task_id) in new:
+                version_code, shotgrid_fields = version_request(sg, job)
+                versions.append((version_code, shot_id, task_id, shotgrid_fields))
+            for (idx, job, ids), sg_version in zip(new, sg.batch_add_versions(versions, batch_size) if versions else []):
+                if isinstance(sg_version, Exception):
+                    results[idx] = (rows[idx], sg_version)
+                else:
+                    job.checkpoint(version_id=sg_version["id"], version_number=job.state["shotgrid_data"]["version_number"])
+            for idx, job, ids in written:
+                if results[idx] is not None:
+                    continue
+                try:
+                    version_code = register_version(sg, job, *ids, progress=progresses[idx])
+                    record_publish(job, version_code)
+                    results[idx] = (rows[idx], version_code)
+                except Exception as e:
+                    results[idx] = (rows[idx], e)
+    for idx, progress in progresses.items():
+        result = results[idx][1]
+        if isinstance(result, Exception):
+            progress.finish(error=result)
+        else:
+            progress.finish(result)
+    return results
+
+class PublishBatch:
+    RETURN_TYPES = ()
+    FUNCTION = "publish_batch"
+    OUTPUT_NODE = True
+    CATEGORY = "MovieLabs > Util > Grant8&9"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "artist_login": ("STRING", {"default": "", "label": "Artist Login", "tooltip": "Your ShotGrid login"}),
+                "manifest": ("STRING", {"default": "", "multiline": True, "label": "Manifest", "tooltip": "One publish per line: shot_code, task_name, original, proxy, notes (CSV), or a JSON list of objects with those keys"}),
+            },
+        }
+
+    def publish_batch(self, artist_login, manifest):
+        catalog.require_artist(artist_login)
+        rows = parse_manifest(manifest)
+        if not rows:
+            raise Exception("The manifest has no rows to publish")
+
+        lines = []
+        failures = 0
+        for row, result in publish_many(artist_login, rows):
+            if isinstance(result, Exception):
+                failures += 1
+                lines.append(f"FAILED {row['shot_code']} {row['task_name']}: {result}")
+            else:
+                lines.append(f"Published {result}")
+        for line in lines:
+            print(line)
+        if failures:
+            raise Exception(f"{failures} of {len(rows)} publishes failed:\n" + "\n".join(lines))
+        return {"ui": {"text": lines}}
+
+NODE_CLASS_MAPPINGS = {
+    "PublishBatch": PublishBatch,
+}
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "PublishBatch": "Publish Batch (MovieLabs)",
+}
@@ -1,6 +1,14 @@
-from .shotgrid import shots, artist_logins, ShotGrid
+from .catalog import catalog
 from .config import shotgrid_config, task_names
 from .fs import create_task_version
+from .history import history, publish_fingerprint
+from .progress import progress_board
+
+PUBLISH_BLENDER = "publish_blender"
+
+def blender_fingerprint(shot_code, blender_file_path):
+    """Fingerprint of a Blender publish over its inputs and the size and mtime of the file"""
+    return publish_fingerprint(PUBLISH_BLENDER, {"shot_code": shot_code, "blender_file_path": blender_file_path}, [blender_file_path])
 
 
 class PublishBlender:
@@ -11,14 +19,22 @@ class PublishBlender:
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "shot_code": (list(shots.keys()),),
+                "shot_code": ("STRING", {"default": "", "label": "Shot Code"}),
                 "blender_file_path": ("STRING", {"default": "", "label": "Blender File Path", "tooltip": "Path to the blender file to publish"}),
             },
+            "optional": {
+                "force": ("BOOLEAN", {"default": False, "label": "Force", "tooltip": "Publish a new version even if this file was already published"}),
+            },
         }
     
     @classmethod
     def IS_CHANGED(cls, **kwargs):
-        return float("NaN")
+        if kwargs.get("force"):
+            return float("NaN")
+        try:
+            return blender_fingerprint(kwargs["shot_code"], kwargs["blender_file_path"])
+        except Exception:
+            return float("NaN")
 
     RETURN_TYPES = ()
     FUNCTION = "publish_blender"
@@ -30,9 +46,22 @@ class PublishBlender:
         task_name = "Blender Files"
         blender_file_path = kwargs["blender_file_path"]
 
-        if shot_code not in shots:
-            raise Exception(f"Shot {shot_code} not found")
-        create_task_version(shot_code, task_name, blender_file_path)
+        catalog.require_shot(shot_code)
+        fingerprint = blender_fingerprint(shot_code, blender_file_path)
+        if not kwargs.get("force"):
+            existing = history.get(fingerprint)
+            if existing is not None:
+                message = f"{shot_code} {task_name} v{existing['version_number']} was already published from this file, enable force to publish again"
+                print(message)
+                return {"ui": {"text": [message]}}
+        progress = progress_board.start(shot_code, task_name)
+        try:
+            result = create_task_version(shot_code, task_name, blender_file_path)
+        except BaseException as e:
+            progress.finish(error=e)
+            raise
+        progress.finish(f"{shot_code} {task_name} v{result['version_number']}")
+        history.record(fingerprint, PUBLISH_BLENDER, result)
         return ()
 
 NODE_CLASS_MAPPINGS = {
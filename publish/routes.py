@@ -0,0 +1,78 @@
+try:
+    from aiohttp import web
+    from server import PromptServer
+except ImportError:  # Imported outside ComfyUI, e.g. by the benchmarks
+    PromptServer = None
+
+from .catalog import catalog, DEFAULT_SEARCH_LIMIT
+from .config import shotgrid_config
+from .jobs import publish_queue
+from .progress import progress_board
+from .shotgrid_async import get_async_session
+
+# Largest search a client may ask for
+MAX_SEARCH_LIMIT = 500
+
+# Websocket event carrying the state of a running publish
+PROGRESS_EVENT = "movielabs.publish.progress"
+
+def _search_args(request):
+    prefix = request.query.get("prefix", "")
+    try:
+        limit = int(request.query.get("limit", DEFAULT_SEARCH_LIMIT))
+    except ValueError:
+        limit = DEFAULT_SEARCH_LIMIT
+    return prefix, max(1, min(limit, MAX_SEARCH_LIMIT))
+
+def _catalog_response(matches):
+    return web.json_response({"matches": matches, "ready": catalog.fetched_at is not None, "fetched_at": catalog.fetched_at})
+
+async def _live_task_names(shot_code, prefix, limit):
+    """Task names of a shot missing from the catalog, looked up with the async client, or [] if ShotGrid cannot be reached"""
+    try:
+        tasks = await get_async_session(shotgrid_config, None).get_tasks(shot_code, None)
+    except Exception as e:
+        print(f"Could not look up the tasks of {shot_code} in ShotGrid: {e}")
+        return []
+    prefix = prefix.lower()
+    names = sorted({task["attributes"]["content"] for task in tasks if "attributes" in task and "content" in task["attributes"]})
+    return [name for name in names if name.lower().startswith(prefix)][:limit]
+
+if PromptServer is not None:
+    routes = PromptServer.instance.routes
+
+    @routes.get("/movielabs/shots")
+    async def search_shots(request):
+        prefix, limit = _search_args(request)
+        return _catalog_response(catalog.search_shots(prefix, limit))
+
+    @routes.get("/movielabs/artists")
+    async def search_artists(request):
+        prefix, limit = _search_args(request)
+        return _catalog_response(catalog.search_artists(prefix, limit))
+
+    @routes.get("/movielabs/tasks")
+    async def search_tasks(request):
+        prefix, limit = _search_args(request)
+        shot_code = request.query.get("shot_code", "")
+        matches = catalog.search_tasks(shot_code, prefix, limit)
+        if not matches and shot_code and shot_code not in catalog.task_names:
+            # A shot created since the last refresh: ask ShotGrid on the server loop rather than listing every task
+            matches = await _live_task_names(shot_code, prefix, limit)
+        return _catalog_response(matches)
+
+    @routes.get("/movielabs/publishes")
+    async def list_publishes(request):
+        return web.json_response({"publishes": progress_board.snapshot()})
+
+    @routes.post("/movielabs/jobs/{job_id}/retry")
+    async def retry_job(request):
+        job_id = request.match_info["job_id"]
+        try:
+            publish_queue.retry(job_id)
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=404 if publish_queue.get(job_id) is None else 409)
+        return web.json_response({"job_id": job_id, "status": publish_queue.get(job_id)["status"]})
+
+    # send_sync hands the event to the server loop, so it is safe from the publishing threads
+    progress_board.subscribe(lambda state: PromptServer.instance.send_sync(PROGRESS_EVENT, state))
@@ -1,13 +1,48 @@
+import json
+import math
+import os
+import re
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 from .config import shotgrid_config, task_names
+from .governor import RateGovernor
+from .metrics import metrics
+
+# Maximum page size accepted by the ShotGrid REST API
+PAGE_SIZE = 500
+
+# Pages fetched concurrently once the record count is known
+DEFAULT_PAGE_WORKERS = 4
+
+# Version creates sent per _batch request
+DEFAULT_BATCH_SIZE = 50
+
+# sg_status_list of a version whose files are still being written, and of a published one
+DEFAULT_PENDING_VERSION_STATUS = "na"
+DEFAULT_PUBLISHED_VERSION_STATUS = "rev"
+
+# Connections kept alive per host by the shared HTTP client
+CONNECTION_POOL_SIZE = 32
+
+# Seconds before expiry at which access tokens are refreshed, and delay before retrying a failed refresh,
+# doubled after every further failure up to REFRESH_MAX_RETRY_DELAY
+REFRESH_MARGIN = 60
+REFRESH_RETRY_DELAY = 10
+REFRESH_MAX_RETRY_DELAY = 600
+
+# Seconds a pooled session may go unused before it stops being refreshed and leaves the pool
+DEFAULT_SESSION_IDLE_TIMEOUT = 30 * 60
 
 def authenticate_with_client_credentials(client, config, user_login):
-    response = client.post(
-        f"{config['server_url']}/api/v1.1/auth/access_token",
+    url = f"{config['server_url']}/api/v1.1/auth/access_token"
+    response = rate_governor.request(url, lambda: client.post(
+        url,
         data={
             "client_id": config["client_id"],
             "client_secret": config["client_secret"],
@@ -18,32 +53,117 @@ def authenticate_with_client_credentials(client, config, user_login):
             "Content-Type": "application/x-www-form-urlencoded",
             "Accept": "application/json"
         }
-    )
+    ))
     return response.json()
 
 def refresh_tokens(client, config, tokens):
-    response = client.post(
-        f"{config['server_url']}/api/v1.1/auth/access_token",
+    url = f"{config['server_url']}/api/v1.1/auth/access_token"
+    response = rate_governor.request(url, lambda: client.post(
+        url,
         data={"refresh_token": tokens["refresh_token"], "grant_type": "refresh_token"},
         headers={"Content-Type": "application/x-www-form-urlencoded", "Accept": "application/json"}
-    )
+    ))
     return response.json()
 
+def endpoint_label(server_url, url):
+    """Name of a request URL for metrics: its path with record ids replaced, or "storage" for upload URLs"""
+    if not url.startswith(server_url):
+        return "storage"
+    return re.sub(r"/\d+(?=/|$)", "/{id}", urlsplit(url).path)
+
+def request_body_size(kwargs):
+    """Bytes of a raw request body (an upload part or file), 0 for JSON and form bodies"""
+    data = kwargs.get("data")
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return len(data)
+    if hasattr(data, "fileno"):
+        return os.fstat(data.fileno()).st_size
+    return 0
+
 def create_client():
     client = requests.Session()
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retries)
+    # 429 and 503 are throttling, retried by the rate governor so every request slows down
+    retries = Retry(total=5, backoff_factor=1, status_forcelist=[502, 504])
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=CONNECTION_POOL_SIZE)
     client.mount('http://', adapter)
     client.mount('https://', adapter)
     return client
 
+class TokenScheduler:
+    """A single daemon thread that refreshes the tokens of every pooled session before they expire.
+
+    Sessions unused for their idle_timeout are unregistered and handed to on_idle instead.
+    """
+    def __init__(self, on_idle=None):
+        self._cond = threading.Condition()
+        self._sessions = set()
+        self._thread = None
+        self.on_idle = on_idle
+
+    def register(self, session):
+        with self._cond:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="shotgrid-token-refresh", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def unregister(self, session):
+        with self._cond:
+            self._sessions.discard(session)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                idle = [session for session in self._sessions if session.idle_at() <= now]
+                self._sessions.difference_update(idle)
+                due = [session for session in self._sessions if session.refresh_at <= now]
+                if not due and not idle:
+                    next_wakeup = min((min(session.refresh_at, session.idle_at()) for session in self._sessions), default=None)
+                    self._cond.wait(None if next_wakeup is None else next_wakeup - now)
+                    continue
+            for session in idle:
+                if self.on_idle is not None:
+                    self.on_idle(session)
+            for session in due:
+                try:
+                    session.refresh()
+                except Exception as e:
+                    # Back off; requests still re-authenticate on their own if the token lapses
+                    session.refresh_failures += 1
+                    delay = min(REFRESH_RETRY_DELAY * 2 ** (session.refresh_failures - 1), REFRESH_MAX_RETRY_DELAY)
+                    session.refresh_at = time.monotonic() + delay
+                    if session.refresh_failures == 1:
+                        print(f"Could not refresh ShotGrid token for {session.user_login or 'script user'}, retrying with backoff: {e}")
+                    continue
+                if session.refresh_failures:
+                    print(f"Refreshed ShotGrid token for {session.user_login or 'script user'} after {session.refresh_failures} failed attempts")
+                    session.refresh_failures = 0
+
+token_scheduler = TokenScheduler()
+
+# One HTTP connection pool for every session, so keep-alive connections are shared across artists
+shared_client = create_client()
+
+# Every ShotGrid request of this process goes through one governor, so throttling slows them all down
+rate_governor = RateGovernor(shotgrid_config.get("rate_limit", {}))
+
 class ShotGrid:
-    def __init__(self, config, user_login):
+    def __init__(self, config, user_login, client=None):
         self.config = config
         self.user_login = user_login
-        self.client = create_client()
-        self._refresh_timer = None
+        self.client = client or shared_client
+        self.tokens = None
+        self.expires_at = 0
+        self.refresh_at = 0
+        self.refresh_failures = 0
+        self.idle_timeout = float(config.get("session_idle_timeout", DEFAULT_SESSION_IDLE_TIMEOUT))
+        self.last_used = time.monotonic()
+        self._auth_lock = threading.Lock()
         self._initial_auth()
+        token_scheduler.register(self)
 
     def __enter__(self):
         return self
@@ -51,95 +171,160 @@ class ShotGrid:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.cleanup()
 
+    def _set_tokens(self, tokens):
+        now = time.monotonic()
+        self.tokens = tokens
+        self.expires_at = now + tokens["expires_in"]
+        self.refresh_at = now + max(tokens["expires_in"] - REFRESH_MARGIN, tokens["expires_in"] / 2)
+
     def _initial_auth(self):
-        resp_json = authenticate_with_client_credentials(self.client, self.config, self.user_login)
-        if "access_token" in resp_json:
-            self.tokens = resp_json
-            # Set up refresh timer
-            self.cleanup()
-            
-            self._refresh_timer = threading.Timer(
-                self.tokens["expires_in"] - 30,
-                self._refresh_tokens
-            )
-            self._refresh_timer.daemon = True
-            self._refresh_timer.start()
-        else:
-            raise Exception("Could not authenticate with ShotGrid")
-
-    def _refresh_tokens(self):
-        # Refresh using refresh_token
-        resp_json = refresh_tokens(self.client, self.config, self.tokens)
-        self.tokens = resp_json
-        
-        # Set up next refresh
-        self.cleanup()
-        
-        self._refresh_timer = threading.Timer(
-            self.tokens["expires_in"] - 30,
-            self._refresh_tokens
-        )
-        self._refresh_timer.daemon = True
-        self._refresh_timer.start()
+        with self._auth_lock, metrics.span("shotgrid.auth", grant="client_credentials"):
+            resp_json = authenticate_with_client_credentials(self.client, self.config, self.user_login)
+            if "access_token" not in resp_json:
+                raise Exception("Could not authenticate with ShotGrid")
+            self._set_tokens(resp_json)
+
+    def refresh(self):
+        """Refresh the access token, falling back to a full authentication if the refresh token was rejected"""
+        with self._auth_lock, metrics.span("shotgrid.auth", grant="refresh_token"):
+            resp_json = refresh_tokens(self.client, self.config, self.tokens)
+            if "access_token" in resp_json:
+                self._set_tokens(resp_json)
+                return
+        self._initial_auth()
 
     def cleanup(self):
-        if self._refresh_timer:
-            self._refresh_timer.cancel()
-            self._refresh_timer = None
+        token_scheduler.unregister(self)
 
-    def get_shots(self):
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}", "Accept": "application/json"}
-        params = {"filter[project.Project.id]": self.config["project_id"], "filter[tasks.Task.content]": ",".join(task_names), "fields": "id,code,project,content"}
-        response = self.client.get(f"{self.config['server_url']}/api/v1.1/entity/Shot", headers=headers, params=params)
-        sg_shots = response.json()
-        if "errors" in sg_shots:
+    def idle_at(self):
+        """When the session has gone unused for its idle_timeout"""
+        return self.last_used + self.idle_timeout
+
+    def _request(self, method, path, auth=True, **kwargs):
+        """Send a request to ShotGrid, or to an absolute upload URL, with a valid access token.
+
+        Tokens are refreshed ahead of expiry by the scheduler; a 401 (e.g. after the machine slept)
+        re-authenticates once and replays the request.
+        """
+        self.last_used = time.monotonic()
+        url = path if path.startswith(("http://", "https://")) else f"{self.config['server_url']}{path}"
+        headers = {"Accept": "application/json"}
+        headers.update(kwargs.pop("headers", {}))
+        # Unauthenticated requests go to presigned storage URLs, whose paths are unique per upload
+        endpoint = endpoint_label(self.config["server_url"], url) if auth else "storage"
+        with metrics.span("shotgrid.request", method=method, endpoint=endpoint) as span:
+            span.add_bytes(request_body_size(kwargs))
+            if not auth:
+                response = self._send(method, url, headers, kwargs)
+                span.set_label("code", response.status_code)
+                return response
+            if time.monotonic() >= self.expires_at:
+                self.refresh()
+            headers["Authorization"] = f"Bearer {self.tokens['access_token']}"
+            response = self._send(method, url, headers, kwargs)
             if response.status_code == 401:
-                self.cleanup()
                 self._initial_auth()
-                return self.get_shots()
-            else:
-                raise Exception("Error getting shots from ShotGrid")
-        if "data" in sg_shots and len(sg_shots["data"]) > 0:
-            return [shot for shot in sg_shots["data"] if "attributes" in shot and "code" in shot["attributes"]]
-        else:
-            return []
+                headers["Authorization"] = f"Bearer {self.tokens['access_token']}"
+                response = self._send(method, url, headers, kwargs)
+            span.set_label("code", response.status_code)
+            return response
+
+    def _send(self, method, url, headers, kwargs):
+        """Send one request through the rate governor, rewinding a file body before a throttled retry"""
+        data = kwargs.get("data")
+        rewind = None
+        if hasattr(data, "seek"):
+            position = data.tell()
+            rewind = lambda: data.seek(position)
+        return rate_governor.request(url, lambda: self.client.request(method, url, headers=headers, **kwargs), rewind)
+
+    def _search_page(self, entity, filters, fields, sort, page):
+        body = {"filters": filters, "fields": fields}
+        params = {"page[size]": PAGE_SIZE, "page[number]": page}
+        if sort:
+            params["sort"] = sort
+        headers = {"Content-Type": "application/vnd+shotgun.api3_array+json"}
+        response = self._request("POST", f"/api/v1.1/entity/{entity}/_search", headers=headers, params=params, data=json.dumps(body))
+        result = response.json()
+        if "errors" in result:
+            raise Exception(f"Error getting {entity} records from ShotGrid")
+        return result.get("data", [])
+
+    def count_entities(self, entity, filters):
+        """Number of records matching the filters, from the _summarize endpoint"""
+        body = {"filters": filters, "summary_fields": [{"field": "id", "type": "record_count"}]}
+        headers = {"Content-Type": "application/vnd+shotgun.api3_array+json"}
+        response = self._request("POST", f"/api/v1.1/entity/{entity}/_summarize", headers=headers, data=json.dumps(body))
+        result = response.json()
+        if "errors" in result:
+            raise Exception(f"Error counting {entity} records in ShotGrid")
+        return int(result["data"]["summaries"]["id"])
+
+    def iter_entities(self, entity, filters, fields, sort=None):
+        """Yield every matching record, only requesting the given fields.
+
+        The first page is yielded as soon as it arrives. If there are more, the total is counted
+        and the remaining pages are fetched concurrently, still yielded in order.
+        """
+        page = self._search_page(entity, filters, fields, sort, 1)
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        page_number = 1
+        try:
+            page_count = math.ceil(self.count_entities(entity, filters) / PAGE_SIZE)
+        except Exception:
+            page_count = 1
+        if page_count > 1:
+            workers = max(1, int(self.config.get("page_workers", DEFAULT_PAGE_WORKERS)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shotgrid-pages") as executor:
+                for page in executor.map(lambda number: self._search_page(entity, filters, fields, sort, number), range(2, page_count + 1)):
+                    yield from page
+            page_number = page_count
+        # Keep paging one at a time if records were added since the count (or it was unavailable)
+        while len(page) == PAGE_SIZE:
+            page_number += 1
+            page = self._search_page(entity, filters, fields, sort, page_number)
+            yield from page
+
+    def iter_shots(self):
+        filters = [["project.Project.id", "is", self.config["project_id"]], ["tasks.Task.content", "in", task_names]]
+        for shot in self.iter_entities("Shot", filters, ["code"]):
+            if "attributes" in shot and "code" in shot["attributes"]:
+                yield shot
+
+    def get_shots(self):
+        return list(self.iter_shots())
     
     def get_shot(self, shot_code):
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}", "Accept": "application/json"}
         params = {"filter[project.Project.id]": self.config["project_id"], "filter[code]": shot_code, "fields": "id,code,project,content"}
-        response = self.client.get(f"{self.config['server_url']}/api/v1.1/entity/Shot", headers=headers, params=params)
+        response = self._request("GET", "/api/v1.1/entity/Shot", params=params)
         sg_shot = response.json()
         if "errors" in sg_shot:
-            if response.status_code == 401:
-                self.cleanup()
-                self._initial_auth()
-                return self.get_shot(shot_code)
-            else:
-                raise Exception("Error getting shot from ShotGrid")
+            raise Exception("Error getting shot from ShotGrid")
         if "data" in sg_shot and len(sg_shot["data"]) > 0:
             return [shot for shot in sg_shot["data"] if "attributes" in shot and "code" in shot["attributes"]]
         else:
             return []
     
     def get_tasks(self, shot_code, task_name):
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}", "Accept": "application/json"}
         params = {"filter[project.Project.id]": self.config["project_id"], "filter[entity.Shot.code]": shot_code, "fields": "id,name,content,step"}
         if task_name:
             params["filter[content]"] = task_name
-        response = self.client.get(f"{self.config['server_url']}/api/v1.1/entity/Task", headers=headers, params=params)
+        response = self._request("GET", "/api/v1.1/entity/Task", params=params)
         sg_tasks = response.json()
         if "errors" in sg_tasks:
-            if response.status_code == 401:
-                self.cleanup()
-                self._initial_auth()
-                return self.get_tasks(shot_code, task_name)
-            else:
-                raise Exception("Error getting tasks from ShotGrid")
+            raise Exception("Error getting tasks from ShotGrid")
         if "data" in sg_tasks and len(sg_tasks["data"]) > 0:
             return sg_tasks["data"]
         else:
             return []
-    
+
+    def get_project_tasks(self):
+        """All tasks of the configured task names across the project"""
+        filters = [["project.Project.id", "is", self.config["project_id"]], ["content", "in", task_names]]
+        return list(self.iter_entities("Task", filters, ["content", "entity"]))
+
     # def get_versions(self, shot_code):
     #     headers = {"Authorization": f"Bearer {self.tokens['access_token']}", "Accept": "application/json"}
     #     params = {"filter[project.Project.id]": self.config["project_id"], "filter[entity.Shot.code]": shot_code, "fields": "id,code,entity.Shot.id"}
@@ -163,18 +348,14 @@ class ShotGrid:
     def get_version_code(self, shot_code, task_name, version_number):
         return self.config["version_convention"][task_name].format(SHOT_CODE=shot_code, VERSION_NUMBER=version_number)
     
+    def iter_artists(self):
+        filters = [["projects.Project.id", "is", self.config["project_id"]]]
+        return self.iter_entities("HumanUser", filters, ["login"], sort="login")
+
     def get_artists(self):
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}", "Accept": "application/json"}
-        params = {
-            "fields": "firstname,lastname,login",
-            "filter[projects.Project.id]": self.config["project_id"],
-            "sort": "login"
-        }
-        response = self.client.get(f"{self.config['server_url']}/api/v1.1/entity/HumanUser", headers=headers, params=params)
-        data = response.json()
-        return data.get("data", [])
+        return list(self.iter_artists())
     
-    def add_version(self, version_code, shot_id, task_id, fields):
+    def _version_data(self, version_code, shot_id, task_id, fields):
         params = {
             "project":  { "type": "Project", "id": self.config["project_id"] },
             "entity":   { "type": "Shot",    "id": shot_id },
@@ -182,60 +363,148 @@ class ShotGrid:
         }
         fields["code"] = version_code
         params.update(fields)
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}", "Accept": "application/json"}
-        response = self.client.post(f"{self.config['server_url']}/api/v1/entity/versions", headers=headers, json=params)
+        return params
+
+    def add_version(self, version_code, shot_id, task_id, fields):
+        params = self._version_data(version_code, shot_id, task_id, fields)
+        response = self._request("POST", "/api/v1/entity/versions", json=params)
         sg_version = response.json()
         if "errors" in sg_version:
-            if response.status_code == 401:
-                self.cleanup()
-                self._initial_auth()
-                return self.add_version(version_code, shot_id, task_id, fields)
-            else:
-                raise Exception("Error adding version to ShotGrid")
+            raise Exception("Error adding version to ShotGrid")
         return sg_version["data"]
+
+    def update_version(self, version_id, fields):
+        response = self._request("PUT", f"/api/v1/entity/versions/{version_id}", json=fields)
+        sg_version = response.json()
+        if "errors" in sg_version:
+            raise Exception(f"Error updating version {version_id} in ShotGrid")
+        return sg_version["data"]
+
+    def find_version(self, version_code, task_id):
+        """Version of a task with this code, or None"""
+        filters = [["code", "is", version_code], ["sg_task.Task.id", "is", task_id]]
+        versions = list(self.iter_entities("Version", filters, ["code"]))
+        return versions[0] if versions else None
+
+    def delete_version(self, version_id):
+        response = self._request("DELETE", f"/api/v1/entity/versions/{version_id}")
+        if response.status_code not in (200, 204):
+            raise Exception(f"Error deleting version {version_id} from ShotGrid")
+
+    def batch(self, requests):
+        """Run create/update/delete requests in one _batch round-trip.
+
+        ShotGrid applies a batch as a single transaction: if one request fails, none are applied.
+        """
+        response = self._request("POST", "/api/v1.1/entity/_batch", json={"requests": requests})
+        result = response.json()
+        if "errors" in result:
+            raise Exception(f"Error running batch request on ShotGrid: {result['errors']}")
+        return result["data"]
+
+    def batch_add_versions(self, versions, batch_size=None):
+        """Create many versions from (version_code, shot_id, task_id, fields) tuples in batches of batch_size.
+
+        Returns one entry per version: its data, or the Exception that prevented creating it.
+        A failed batch is retried one version at a time so the error lands on the version that caused it.
+        The batch may have been applied with only its response lost, so versions that exist by then are reused.
+        """
+        batch_size = batch_size or int(self.config.get("batch_size", DEFAULT_BATCH_SIZE))
+        results = []
+        for start in range(0, len(versions), batch_size):
+            chunk = versions[start:start + batch_size]
+            requests = [{"request_type": "create", "entity": "Version", "data": self._version_data(*version)} for version in chunk]
+            try:
+                results.extend(self.batch(requests))
+            except Exception:
+                for version_code, shot_id, task_id, fields in chunk:
+                    try:
+                        results.append(self.find_version(version_code, task_id) or self.add_version(version_code, shot_id, task_id, fields))
+                    except Exception as e:
+                        results.append(e)
+        return results
+
+    def get_tasks_for_shots(self, shot_tasks):
+        """Tasks of many (shot_code, task_name) pairs in one search, as {(shot_code, task_name): [tasks]}"""
+        filters = [
+            ["project.Project.id", "is", self.config["project_id"]],
+            ["entity.Shot.code", "in", sorted(set(shot_code for shot_code, _ in shot_tasks))],
+            ["content", "in", sorted(set(task_name for _, task_name in shot_tasks))],
+        ]
+        tasks = {}
+        for task in self.iter_entities("Task", filters, ["content", "entity"]):
+            shot_code = task["relationships"]["entity"]["data"]["name"]
+            tasks.setdefault((shot_code, task["attributes"]["content"]), []).append(task)
+        return tasks
     
-    def request_file_upload(self, version_id, field_name, filename):
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}", "Accept": "application/json"}
-        response = self.client.get(f"{self.config['server_url']}/api/v1/entity/versions/{version_id}/{field_name}/_upload?filename={filename}", headers=headers)
+    def request_file_upload(self, version_id, field_name, filename, multipart=False):
+        params = {"filename": filename}
+        if multipart:
+            params["multipart_upload"] = "true"
+        response = self._request("GET", f"/api/v1/entity/versions/{version_id}/{field_name}/_upload", params=params)
         if "errors" in response.json():
-            if response.status_code == 401:
-                self.cleanup()
-                self._initial_auth()
-                return self.request_file_upload(version_id, field_name, filename)
-            else:
-                raise Exception("Error requesting file upload to ShotGrid")
+            raise Exception("Error requesting file upload to ShotGrid")
         return response.json()
-    
+
+    def request_upload_part(self, file_upload_data, part_number):
+        """Upload link for one part of a multipart upload, derived from the get_next_part link"""
+        next_part = urlsplit(file_upload_data["links"]["get_next_part"])
+        query = dict(parse_qsl(next_part.query))
+        query["part_number"] = str(part_number)
+        response = self._request("GET", urlunsplit(next_part._replace(query=urlencode(query))))
+        if "errors" in response.json():
+            raise Exception(f"Error requesting upload link for part {part_number} from ShotGrid")
+        return response.json()["links"]["upload"]
+
     def upload_file(self, upload_link, file_path, mime_type):
-        headers = {"Accept": "application/json", "Content-Type": mime_type}
+        headers = {"Content-Type": mime_type}
         with open(file_path, "rb") as f:
-            response = self.client.put(upload_link, headers=headers, data=f)
+            response = self._request("PUT", upload_link, auth=False, headers=headers, data=f)
         if response.status_code != 200:
             raise Exception("Error uploading file to ShotGrid")
 
-    def complete_file_upload(self, file_upload_data):
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}", "Accept": "application/json"}
+    def upload_part(self, upload_link, data):
+        """PUT one part of a multipart upload and return its ETag"""
+        response = self._request("PUT", upload_link, auth=False, data=data)
+        if response.status_code != 200:
+            raise Exception("Error uploading file part to ShotGrid")
+        return response.headers.get("ETag")
+
+    def complete_file_upload(self, file_upload_data, upload_data=None):
         data = {
             "upload_info": file_upload_data["data"],
-            "upload_data": {}
+            "upload_data": upload_data or {}
         }
-        response = self.client.post(f"{self.config['server_url']}{file_upload_data['links']['complete_upload']}", headers=headers, json=data)
+        response = self._request("POST", file_upload_data['links']['complete_upload'], json=data)
         if response.status_code != 201:
-            if response.status_code == 401:
-                self.cleanup()
-                self._initial_auth()
-                return self.complete_file_upload(file_upload_data)
-            else:
-                raise Exception("Error completing file upload to ShotGrid")
-
-sg = ShotGrid(shotgrid_config, None)
-sg_shots = sg.get_shots()
-shots = {shot["attributes"]["code"]: shot for shot in sg_shots if "attributes" in shot and "code" in shot["attributes"]}
-# tasks = {}
-# for shot_code in shots.keys():
-#     tasks[shot_code] = {}
-#     for task_name in task_names:
-#         sg_tasks = sg.get_tasks(shot_code, task_name)
-#         if len(sg_tasks) > 0:
-#             tasks[shot_code][task_name] = sg_tasks[0]
-artist_logins = [artist["attributes"]["login"] for artist in sg.get_artists()]
\ No newline at end of file
+            raise Exception("Error completing file upload to ShotGrid")
+
+_sessions = {}
+# One lock per session key, so an artist's authentication only holds up lookups of that artist
+_session_locks = {}
+_sessions_lock = threading.Lock()
+
+def get_session(config, user_login):
+    """Shared ShotGrid session for an artist login (None for the script user), authenticated once and kept fresh"""
+    key = (config["server_url"], config["client_id"], user_login)
+    session = _sessions.get(key)
+    if session is not None:
+        session.last_used = time.monotonic()
+        return session
+    with _sessions_lock:
+        key_lock = _session_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = ShotGrid(config, user_login)
+            _sessions[key] = session
+        return session
+
+def _drop_session(session):
+    """Remove an idle session from the pool, so the artist's next publish authenticates afresh"""
+    key = (session.config["server_url"], session.config["client_id"], session.user_login)
+    with _sessions_lock:
+        if _sessions.get(key) is session:
+            del _sessions[key]
+
+token_scheduler.on_idle = _drop_session
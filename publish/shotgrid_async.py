@@ -0,0 +1,239 @@
+import asyncio
+import json
+import math
+import time
+import weakref
+
+try:
+    import aiohttp
+except ImportError:  # Bundled with ComfyUI, only missing when the package is used outside it
+    aiohttp = None
+
+from .config import task_names
+from .metrics import metrics
+from .shotgrid import PAGE_SIZE, CONNECTION_POOL_SIZE, REFRESH_MARGIN, endpoint_label, rate_governor
+
+# Requests in flight at once per session, unless shotgrid.async_concurrency says otherwise
+DEFAULT_CONCURRENCY = 8
+
+# One aiohttp client session per event loop, shared by every AsyncShotGrid running on it
+_client_sessions = weakref.WeakKeyDictionary()
+
+def get_client_session():
+    """Shared aiohttp session of the running event loop, so keep-alive connections are pooled across artists"""
+    if aiohttp is None:
+        raise Exception("aiohttp is required for the async ShotGrid client")
+    loop = asyncio.get_running_loop()
+    client = _client_sessions.get(loop)
+    if client is None or client.closed:
+        client = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=CONNECTION_POOL_SIZE))
+        _client_sessions[loop] = client
+    return client
+
+class _Response:
+    """Status, headers and body of an aiohttp response read in full, for the rate governor"""
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+async def _send(client, method, url, **kwargs):
+    """Send one request through the rate governor shared with the sync client, rewinding a file body before a throttled retry"""
+    data = kwargs.get("data")
+    rewind = None
+    if hasattr(data, "seek"):
+        position = data.tell()
+        rewind = lambda: data.seek(position)
+
+    async def send():
+        async with client.request(method, url, **kwargs) as response:
+            return _Response(response.status, response.headers, await response.read())
+    return await rate_governor.request_async(url, send, rewind)
+
+class AsyncShotGrid:
+    """asyncio counterpart of ShotGrid, so lookups and uploads for many versions overlap on one event loop.
+
+    At most `concurrency` requests are in flight at once; the rest wait their turn. Requests are
+    paced and retried when throttled by the same rate governor as the sync client. A session
+    must only be used from the event loop it was first used on. Tokens are refreshed when a
+    request finds them about to expire, and a 401 re-authenticates once and replays the request.
+    """
+    def __init__(self, config, user_login, client=None, concurrency=None):
+        self.config = config
+        self.user_login = user_login
+        self._client = client
+        self.tokens = None
+        self.expires_at = 0
+        self._auth_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(concurrency or int(config.get("async_concurrency", DEFAULT_CONCURRENCY)))
+
+    @property
+    def client(self):
+        return self._client or get_client_session()
+
+    async def _token_request(self, data):
+        response = await _send(
+            self.client, "POST", f"{self.config['server_url']}/api/v1.1/auth/access_token",
+            data={key: value for key, value in data.items() if value is not None},
+            headers={"Accept": "application/json"},
+        )
+        return json.loads(response.body) if response.body else {}
+
+    async def authenticate(self, refresh=False):
+        """Get a new access token, with the refresh token if refresh is set and it is still accepted"""
+        async with self._auth_lock:
+            resp_json = {}
+            if refresh and self.tokens:
+                with metrics.span("shotgrid.auth", grant="refresh_token"):
+                    resp_json = await self._token_request({"refresh_token": self.tokens["refresh_token"], "grant_type": "refresh_token"})
+            if "access_token" not in resp_json:
+                with metrics.span("shotgrid.auth", grant="client_credentials"):
+                    resp_json = await self._token_request({
+                        "client_id": self.config["client_id"],
+                        "client_secret": self.config["client_secret"],
+                        "grant_type": "client_credentials",
+                        "scope": f"sudo_as_login:{self.user_login}" if self.user_login else None,
+                    })
+            if "access_token" not in resp_json:
+                raise Exception("Could not authenticate with ShotGrid")
+            self.tokens = resp_json
+            self.expires_at = time.monotonic() + resp_json["expires_in"]
+
+    async def _request(self, method, path, auth=True, **kwargs):
+        """Send a request and return (status, headers, parsed JSON body or None)"""
+        url = path if path.startswith(("http://", "https://")) else f"{self.config['server_url']}{path}"
+        headers = {"Accept": "application/json"}
+        headers.update(kwargs.pop("headers", {}))
+        endpoint = endpoint_label(self.config["server_url"], url) if auth else "storage"
+        async with self._semaphore:
+            with metrics.span("shotgrid.request", method=method, endpoint=endpoint) as span:
+                for attempt in range(2):
+                    if auth:
+                        if self.tokens is None or time.monotonic() >= self.expires_at - REFRESH_MARGIN:
+                            await self.authenticate(refresh=self.tokens is not None)
+                        headers["Authorization"] = f"Bearer {self.tokens['access_token']}"
+                    response = await _send(self.client, method, url, headers=headers, **kwargs)
+                    body, status, response_headers = response.body, response.status_code, response.headers
+                    if status == 401 and auth and attempt == 0:
+                        await self.authenticate()
+                        continue
+                    break
+                span.set_label("code", status)
+        data = json.loads(body) if body else None
+        return status, response_headers, data
+
+    async def _search_page(self, entity, filters, fields, sort, page):
+        body = {"filters": filters, "fields": fields}
+        params = {"page[size]": PAGE_SIZE, "page[number]": page}
+        if sort:
+            params["sort"] = sort
+        headers = {"Content-Type": "application/vnd+shotgun.api3_array+json"}
+        _, _, result = await self._request("POST", f"/api/v1.1/entity/{entity}/_search", headers=headers, params=params, data=json.dumps(body))
+        if not result or "errors" in result:
+            raise Exception(f"Error getting {entity} records from ShotGrid")
+        return result.get("data", [])
+
+    async def count_entities(self, entity, filters):
+        body = {"filters": filters, "summary_fields": [{"field": "id", "type": "record_count"}]}
+        headers = {"Content-Type": "application/vnd+shotgun.api3_array+json"}
+        _, _, result = await self._request("POST", f"/api/v1.1/entity/{entity}/_summarize", headers=headers, data=json.dumps(body))
+        if not result or "errors" in result:
+            raise Exception(f"Error counting {entity} records in ShotGrid")
+        return int(result["data"]["summaries"]["id"])
+
+    async def get_entities(self, entity, filters, fields, sort=None):
+        """Every matching record, the pages after the first fetched concurrently"""
+        records = list(await self._search_page(entity, filters, fields, sort, 1))
+        if len(records) < PAGE_SIZE:
+            return records
+        try:
+            page_count = math.ceil(await self.count_entities(entity, filters) / PAGE_SIZE)
+        except Exception:
+            page_count = 1
+        page = records
+        for page in await asyncio.gather(*(self._search_page(entity, filters, fields, sort, number) for number in range(2, page_count + 1))):
+            records.extend(page)
+        # Keep paging one at a time if records were added since the count (or it was unavailable)
+        page_number = max(page_count, 1)
+        while len(page) == PAGE_SIZE:
+            page_number += 1
+            page = await self._search_page(entity, filters, fields, sort, page_number)
+            records.extend(page)
+        return records
+
+    async def get_shots(self):
+        filters = [["project.Project.id", "is", self.config["project_id"]], ["tasks.Task.content", "in", task_names]]
+        shots = await self.get_entities("Shot", filters, ["code"])
+        return [shot for shot in shots if "attributes" in shot and "code" in shot["attributes"]]
+
+    async def get_tasks(self, shot_code, task_name):
+        params = {"filter[project.Project.id]": self.config["project_id"], "filter[entity.Shot.code]": shot_code, "fields": "id,name,content,step"}
+        if task_name:
+            params["filter[content]"] = task_name
+        _, _, sg_tasks = await self._request("GET", "/api/v1.1/entity/Task", params=params)
+        if not sg_tasks or "errors" in sg_tasks:
+            raise Exception("Error getting tasks from ShotGrid")
+        return sg_tasks.get("data") or []
+
+    async def get_artists(self):
+        filters = [["projects.Project.id", "is", self.config["project_id"]]]
+        return await self.get_entities("HumanUser", filters, ["login"], sort="login")
+
+    def get_version_code(self, shot_code, task_name, version_number):
+        return self.config["version_convention"][task_name].format(SHOT_CODE=shot_code, VERSION_NUMBER=version_number)
+
+    async def add_version(self, version_code, shot_id, task_id, fields):
+        params = {
+            "project":  { "type": "Project", "id": self.config["project_id"] },
+            "entity":   { "type": "Shot",    "id": shot_id },
+            "sg_task":  { "type": "Task",    "id": task_id },
+        }
+        params.update(fields)
+        params["code"] = version_code
+        _, _, sg_version = await self._request("POST", "/api/v1/entity/versions", json=params)
+        if not sg_version or "errors" in sg_version:
+            raise Exception("Error adding version to ShotGrid")
+        return sg_version["data"]
+
+    async def request_file_upload(self, version_id, field_name, filename, multipart=False):
+        params = {"filename": filename}
+        if multipart:
+            params["multipart_upload"] = "true"
+        _, _, result = await self._request("GET", f"/api/v1/entity/versions/{version_id}/{field_name}/_upload", params=params)
+        if not result or "errors" in result:
+            raise Exception("Error requesting file upload to ShotGrid")
+        return result
+
+    async def upload_file(self, upload_link, file_path, mime_type):
+        # aiohttp reads file payloads in the default executor, so the event loop is not blocked on disk
+        with open(file_path, "rb") as f:
+            status, _, _ = await self._request("PUT", upload_link, auth=False, headers={"Content-Type": mime_type}, data=f)
+        if status != 200:
+            raise Exception("Error uploading file to ShotGrid")
+
+    async def complete_file_upload(self, file_upload_data, upload_data=None):
+        data = {
+            "upload_info": file_upload_data["data"],
+            "upload_data": upload_data or {}
+        }
+        status, _, _ = await self._request("POST", file_upload_data["links"]["complete_upload"], json=data)
+        if status != 201:
+            raise Exception("Error completing file upload to ShotGrid")
+
+    async def upload_movie(self, version_id, field_name, file_path, mime_type):
+        """Request, send and complete a single-part upload of a file to a Version field"""
+        file_upload_data = await self.request_file_upload(version_id, field_name, file_path)
+        await self.upload_file(file_upload_data["links"]["upload"], file_path, mime_type)
+        await self.complete_file_upload(file_upload_data)
+
+# Event loop -> {(server_url, client_id, user_login): AsyncShotGrid}
+_sessions = weakref.WeakKeyDictionary()
+
+def get_async_session(config, user_login):
+    """Shared async ShotGrid session for an artist login on the running event loop (None for the script user)"""
+    sessions = _sessions.setdefault(asyncio.get_running_loop(), {})
+    key = (config["server_url"], config["client_id"], user_login)
+    session = sessions.get(key)
+    if session is None:
+        session = sessions[key] = AsyncShotGrid(config, user_login)
+    return session
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+
+from .manifest import hash_bytes, hash_file
+
+# Hidden folder of a task directory holding versions that are still being written
+STAGING_DIR = ".staging"
+
+PROGRESS_SUFFIX = ".progress"
+
+def _read_progress(path):
+    """Header and {key: entry} of a progress record, skipping a last line cut short by a crash"""
+    header = None
+    done = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if header is None:
+                    header = entry
+                else:
+                    done[entry["key"]] = entry
+    except OSError:
+        return None, {}
+    return header, done
+
+class StagedPublish:
+    """A version written into the hidden staging folder of its task directory, with a progress record.
+
+    Every finished file is appended to the record. A retry of the same publish (same shot, task
+    and sources) takes the staged version over and skips the files whose size and content hash
+    (or modification time, when no hash was recorded) still match their source. promote() then
+    moves the files into place with renames, so a version folder is never seen half written.
+    """
+    def __init__(self, task_dir, name, version_number, publish_key, done=None):
+        self.task_dir = task_dir
+        self.name = name
+        self.version_number = version_number
+        self.publish_key = publish_key
+        self.dir = os.path.join(task_dir, STAGING_DIR, name)
+        self.record_path = os.path.join(task_dir, STAGING_DIR, name + PROGRESS_SUFFIX)
+        self.done = done or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def find(cls, task_dir, publish_key):
+        """Staged version left by an interrupted attempt of the same publish, or None"""
+        staging_dir = os.path.join(task_dir, STAGING_DIR)
+        if not os.path.isdir(staging_dir):
+            return None
+        for entry in os.scandir(staging_dir):
+            if not entry.name.endswith(PROGRESS_SUFFIX):
+                continue
+            header, done = _read_progress(entry.path)
+            if header is None or header.get("publish") != publish_key:
+                continue
+            staged = cls(task_dir, entry.name[:-len(PROGRESS_SUFFIX)], header["version_number"], publish_key, done)
+            if not os.path.isdir(staged.dir):
+                # Promoted just before the record could be removed
+                os.remove(entry.path)
+                continue
+            return staged
+        return None
+
+    def start(self):
+        os.makedirs(self.dir, exist_ok=True)
+        if not os.path.exists(self.record_path):
+            with open(self.record_path, "w") as f:
+                f.write(json.dumps({"publish": self.publish_key, "version_number": self.version_number}) + "\n")
+
+    def path(self, file_name):
+        return os.path.join(self.dir, file_name)
+
+    def is_done(self, key, src, data=None):
+        """Whether the file of this key was staged by a previous attempt from the same source content.
+
+        data is the source already read into memory, to hash it without reading it again.
+        """
+        entry = self.done.get(key)
+        if entry is None:
+            return False
+        try:
+            staged_size = os.path.getsize(self.path(entry["file"]))
+            stat = os.stat(src)
+        except OSError:
+            return False
+        if staged_size != entry.get("stored_size", entry["size"]) or stat.st_size != entry["size"]:
+            return False
+        if entry.get("hash"):
+            return (hash_bytes(data) if data is not None else hash_file(src)) == entry["hash"]
+        return stat.st_mtime_ns == entry["mtime_ns"]
+
+    def discard(self, dst):
+        """Remove what an interrupted attempt left of a file before it is written again"""
+        try:
+            os.remove(dst)
+        except FileNotFoundError:
+            pass
+
+    def record(self, key, src, dst, digest=None):
+        stat = os.stat(src)
+        entry = {"key": key, "file": os.path.basename(dst), "size": stat.st_size, "stored_size": os.path.getsize(dst), "mtime_ns": stat.st_mtime_ns, "hash": digest}
+        with self._lock:
+            with open(self.record_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.done[key] = entry
+
+    def promote(self, final_dir):
+        """Move the staged files into final_dir, in one rename when the folder does not exist yet"""
+        if not os.path.exists(final_dir):
+            os.rename(self.dir, final_dir)
+        else:
+            for entry in os.scandir(self.dir):
+                os.replace(entry.path, os.path.join(final_dir, entry.name))
+            os.rmdir(self.dir)
+        os.remove(self.record_path)
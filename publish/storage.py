@@ -0,0 +1,102 @@
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:  # Optional, only needed by tasks published with compression
+    zstandard = None
+
+from .transfer import copy_files
+
+COMPRESSED_SUFFIX = ".zst"
+DEFAULT_COMPRESSION_LEVEL = 3
+
+# Sidecar of a version folder listing its compressed files and how to restore them
+STORAGE_MANIFEST_SUFFIX = ".storage.json"
+
+# Bytes handed to the compressor per write; large enough for its worker threads to split
+CHUNK_SIZE = 4 * 1024 * 1024
+
+def require_zstandard():
+    if zstandard is None:
+        raise Exception("The zstandard package is required for tasks published with zstd compression, install it with pip install zstandard")
+
+def compressed_name(file_name):
+    return file_name + COMPRESSED_SUFFIX
+
+def compress_file(src, dst, level=DEFAULT_COMPRESSION_LEVEL, threads=-1, digest=None):
+    """Write src to dst as a zstd frame. threads=-1 compresses on every core, 0 on the calling thread only.
+
+    The bytes read are fed to digest (a manifest.ContentHash) if given.
+    """
+    require_zstandard()
+    compressor = zstandard.ZstdCompressor(level=level, threads=threads, write_content_size=True)
+    size = os.path.getsize(src)
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        compressor.copy_stream(digest.reader(fsrc) if digest is not None else fsrc, fdst, size=size, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+    return "zstd"
+
+def compress_data(dst, data, level=DEFAULT_COMPRESSION_LEVEL, threads=0):
+    """Write bytes already read into memory to dst as a zstd frame"""
+    require_zstandard()
+    with open(dst, "wb") as f:
+        f.write(zstandard.ZstdCompressor(level=level, threads=threads, write_content_size=True).compress(data))
+    return "zstd"
+
+def write_storage_manifest(path, codec, level, files):
+    """Record the codec of a version's files, {stored name: original name}, replacing the sidecar atomically"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"codec": codec, "level": level, "files": files}, f, indent=1)
+    os.replace(tmp_path, path)
+
+def find_storage_manifest(path):
+    """Sidecar of a version folder, or the one listing a published file, or None if stored uncompressed"""
+    folder = path if os.path.isdir(path) else os.path.dirname(path)
+    for entry in os.scandir(folder):
+        if not entry.name.endswith(STORAGE_MANIFEST_SUFFIX):
+            continue
+        with open(entry.path, "r") as f:
+            manifest = json.load(f)
+        if os.path.isdir(path) or os.path.basename(path) in manifest["files"]:
+            return manifest
+    return None
+
+def open_published(path, codec=None):
+    """Binary file object reading a published file's original bytes, decompressing on the fly.
+
+    The codec is taken from the file name unless given, e.g. from the version's sidecar.
+    """
+    if codec is None:
+        codec = "zstd" if path.endswith(COMPRESSED_SUFFIX) else "none"
+    if codec == "none":
+        return open(path, "rb")
+    if codec != "zstd":
+        raise ValueError(f"Unknown codec {codec} for {path}")
+    require_zstandard()
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_size=CHUNK_SIZE, closefd=True)
+
+def restore_file(path, dst=None, codec=None):
+    """Write the original bytes of a published file to dst (its name without the codec suffix by default)"""
+    if dst is None:
+        dst = path[:-len(COMPRESSED_SUFFIX)] if path.endswith(COMPRESSED_SUFFIX) else path + ".restored"
+    with open_published(path, codec) as fsrc, open(dst, "wb") as fdst:
+        while True:
+            chunk = fsrc.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            fdst.write(chunk)
+    return dst
+
+def restore_version(path, dst_dir, workers=None):
+    """Restore the compressed files of a version folder (or one published file) into dst_dir under their original names"""
+    manifest = find_storage_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"No {STORAGE_MANIFEST_SUFFIX} sidecar found for {path}")
+    os.makedirs(dst_dir, exist_ok=True)
+    folder = path if os.path.isdir(path) else os.path.dirname(path)
+    files = manifest["files"] if os.path.isdir(path) else {os.path.basename(path): manifest["files"][os.path.basename(path)]}
+    pairs = [(os.path.join(folder, stored), os.path.join(dst_dir, name)) for stored, name in files.items()]
+    # Decompression releases the GIL, so frames restore in parallel
+    copy_files(pairs, workers=workers or os.cpu_count(), copy_fn=lambda src, dst: restore_file(src, dst, manifest["codec"]))
+    return [dst for _, dst in pairs]
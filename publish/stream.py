@@ -0,0 +1,202 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from .manifest import hash_bytes
+from .transfer import copy_files
+
+DEFAULT_FRAME_RATE = 24
+DEFAULT_PROXY_EXTENSION = "mov"
+DEFAULT_OUTPUT_ARGS = ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-crf", "18", "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2"]
+# EXR frames hold linear light; convert to sRGB so the proxy looks like the comp viewer
+DEFAULT_EXR_INPUT_ARGS = ["-apply_trc", "iec61966_2_1"]
+
+class OrderedPipe:
+    """Writes chunks to a stream in index order, whatever order they are put in.
+
+    A put more than `window` chunks ahead of the next one to write waits, which bounds the
+    memory held for out-of-order chunks. The window must be at least the number of threads
+    putting, or the chunk everyone is waiting for may never be put.
+    """
+    def __init__(self, stream, window):
+        self.stream = stream
+        self.window = window
+        self._pending = {}
+        self._next = 0
+        self._error = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="publish-stream-pipe", daemon=True)
+        self._thread.start()
+
+    def put(self, index, data):
+        with self._cond:
+            while index >= self._next + self.window and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+            self._pending[index] = data
+            self._cond.notify_all()
+
+    def abort(self, error):
+        """Fail every waiting and future put, e.g. because a chunk will never arrive"""
+        with self._cond:
+            if self._error is None:
+                self._error = error
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._next not in self._pending and not self._closed and self._error is None:
+                    self._cond.wait()
+                if self._error is not None or self._next not in self._pending:
+                    return
+                data = self._pending.pop(self._next)
+            try:
+                self.stream.write(data)
+            except Exception as e:
+                self.abort(e)
+                return
+            with self._cond:
+                self._next += 1
+                self._cond.notify_all()
+
+    def close(self):
+        """Wait for every chunk put so far to be written, raising the error that stopped the pipe, if any"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        if self._pending:
+            raise Exception(f"Chunk {self._next} was never streamed")
+
+class ProxyEncoder:
+    """Encoder subprocess (ffmpeg by default) building a proxy movie from frames piped to its stdin.
+
+    The movie is written next to its final path and renamed into place once the encoder
+    succeeds, so a failed encode never leaves a truncated proxy behind.
+    """
+    def __init__(self, output_path, image_ext, settings, window):
+        command = settings.get("command", "ffmpeg")
+        if shutil.which(command) is None:
+            raise FileNotFoundError(f"Proxy encoder {command} not found. Install ffmpeg or set filesystem.proxy_encoder.command in config.json")
+        self.output_path = output_path
+        root, ext = os.path.splitext(output_path)
+        self._partial_path = f"{root}.partial{ext}"
+        input_args = list(settings.get("exr_input_args", DEFAULT_EXR_INPUT_ARGS)) if image_ext == "exr" else []
+        self.args = [
+            command, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", f"{image_ext}_pipe", "-framerate", str(settings.get("frame_rate", DEFAULT_FRAME_RATE)),
+            *input_args, "-i", "-",
+            *settings.get("output_args", DEFAULT_OUTPUT_ARGS),
+            self._partial_path,
+        ]
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(self.args, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr)
+        self._pipe = OrderedPipe(self._process.stdin, window)
+
+    def feed(self, index, data):
+        try:
+            self._pipe.put(index, data)
+        except OSError:
+            # A broken pipe means the encoder exited, its own message says why
+            raise self._exit_error() from None
+
+    def _exit_error(self):
+        try:
+            returncode = self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            returncode = None
+        self._stderr.seek(0)
+        message = self._stderr.read().decode(errors="replace").strip()
+        return Exception(f"Proxy encoder failed with exit code {returncode}: {message}")
+
+    def abort(self, error):
+        self._pipe.abort(error)
+
+    def finish(self):
+        """Wait for the encoder to write the movie and move it into place"""
+        try:
+            self._pipe.close()
+            self._process.stdin.close()
+            if self._process.wait() != 0:
+                raise self._exit_error()
+            os.replace(self._partial_path, self.output_path)
+        except BaseException:
+            self.kill()
+            raise
+        finally:
+            self._stderr.close()
+
+    def kill(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._stderr.close()
+        try:
+            os.remove(self._partial_path)
+        except FileNotFoundError:
+            pass
+
+def write_data(dst, data):
+    with open(dst, "wb") as f:
+        f.write(data)
+    return "stream"
+
+def stream_frames(frame_copies, keys, deduper=None, encoder=None, progress=None, workers=None, staged=None, write_fn=write_data):
+    """Publish (src, dst) frame pairs reading each source once.
+
+    The bytes read are hashed into the deduper's manifest (linking unchanged frames instead
+    of writing them), written to dst with write_fn(dst, data), and piped in frame order to
+    the proxy encoder if any.
+    Frames already staged by an interrupted attempt are only piped. Returns the method used
+    for each frame.
+    """
+    index = {dst: idx for idx, (_, dst) in enumerate(frame_copies)}
+
+    def stream_one(src, dst):
+        try:
+            with open(src, "rb") as f:
+                data = f.read()
+            key = keys[dst]
+            if staged is not None and staged.is_done(key, src, data):
+                method = "resume"
+                if deduper is not None:
+                    deduper.record(dst, key, staged.done[key]["hash"] or hash_bytes(data), len(data))
+            else:
+                if staged is not None:
+                    staged.discard(dst)
+                if deduper is not None:
+                    method = deduper.publish_data(data, dst, key, write_fn)
+                else:
+                    method = write_fn(dst, data)
+                if staged is not None:
+                    staged.record(key, src, dst, deduper.entries[key]["hash"] if deduper is not None else hash_bytes(data))
+            if encoder is not None:
+                encoder.feed(index[dst], data)
+            return method
+        except BaseException as e:
+            # Frames waiting to be piped behind this one would otherwise wait forever
+            if encoder is not None:
+                encoder.abort(e)
+            raise
+
+    try:
+        methods = copy_files(frame_copies, progress=progress, workers=workers, copy_fn=stream_one)
+        if encoder is not None:
+            encoder.finish()
+            methods.append("encode")
+    except BaseException:
+        if encoder is not None:
+            encoder.kill()
+        raise
+    return methods
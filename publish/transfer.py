@@ -0,0 +1,141 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .config import filesystem_config
+from .conventions import PUBLISH_MODES
+
+DEFAULT_COPY_WORKERS = 8
+
+# Bytes per read of a userspace copy that hashes what it copies
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Linux FICLONE ioctl, supported by btrfs, XFS (reflink=1) and other CoW filesystems
+FICLONE = 0x40049409
+
+def get_copy_workers():
+    """Number of concurrent copies to keep in flight, from config.json"""
+    return max(1, int(filesystem_config.get("copy_workers", DEFAULT_COPY_WORKERS)))
+
+def copy_files(pairs, workers=None, progress=None, copy_fn=shutil.copy):
+    """Copy (src, dst) pairs over a worker pool and return copy_fn's result for each pair.
+
+    progress(done, total, src, dst) is called once per finished file. The first failure
+    cancels every copy that has not started yet and is re-raised to the caller.
+    """
+    pairs = list(pairs)
+    total = len(pairs)
+    if total == 0:
+        return []
+    if workers is None:
+        workers = get_copy_workers()
+    workers = max(1, min(workers, total))
+
+    results = [None] * total
+    failed = threading.Event()
+    lock = threading.Lock()
+    done = 0
+
+    def run(idx, src, dst):
+        nonlocal done
+        if failed.is_set():
+            return
+        try:
+            results[idx] = copy_fn(src, dst)
+        except BaseException:
+            failed.set()
+            raise
+        if progress is not None:
+            with lock:
+                done += 1
+                progress(done, total, src, dst)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="publish-copy")
+    try:
+        futures = [executor.submit(run, idx, src, dst) for idx, (src, dst) in enumerate(pairs)]
+        finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            if future in finished and future.exception() is not None:
+                raise future.exception()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return results
+
+def _remove_partial(dst):
+    try:
+        os.remove(dst)
+    except FileNotFoundError:
+        pass
+
+def reflink_file(src, dst):
+    """Clone src into dst so both share the same extents until either is modified"""
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def _kernel_copy(src, dst, copy_chunk):
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = copy_chunk(fsrc.fileno(), fdst.fileno(), remaining)
+            if copied == 0:
+                raise OSError(f"Unexpected end of file while copying {src}")
+            remaining -= copied
+    shutil.copymode(src, dst)
+
+def copy_file_range_file(src, dst):
+    """Copy src to dst inside the kernel with copy_file_range (server-side on NFS 4.2 / SMB3)"""
+    if not hasattr(os, "copy_file_range"):
+        raise OSError("copy_file_range is not supported on this platform")
+    _kernel_copy(src, dst, lambda fd_in, fd_out, count: os.copy_file_range(fd_in, fd_out, count))
+
+def sendfile_file(src, dst):
+    """Copy src to dst inside the kernel with sendfile"""
+    if not hasattr(os, "sendfile"):
+        raise OSError("sendfile is not supported on this platform")
+    _kernel_copy(src, dst, lambda fd_in, fd_out, count: os.sendfile(fd_out, fd_in, None, count))
+
+ZERO_COPY_METHODS = (
+    ("reflink", reflink_file),
+    ("hardlink", os.link),
+    ("copy_file_range", copy_file_range_file),
+    ("sendfile", sendfile_file),
+)
+
+def publish_file(src, dst, mode="copy", digest=None):
+    """Write src to dst using the given publish mode and return the method actually used.
+
+    "copy" always duplicates the bytes in userspace. "zero_copy" tries a reflink, a hardlink
+    and an in-kernel copy in that order, and only falls back to a userspace copy when the
+    filesystem supports none of them (e.g. source and destination are on different volumes).
+    A userspace copy also feeds the bytes it reads to digest (a manifest.ContentHash) if given.
+    """
+    if mode not in PUBLISH_MODES:
+        raise ValueError(f"Unsupported publish mode: {mode}. Must be {', '.join(PUBLISH_MODES)}")
+    if mode == "zero_copy":
+        for method, fn in ZERO_COPY_METHODS:
+            try:
+                fn(src, dst)
+                return method
+            except FileExistsError:
+                raise
+            except OSError:
+                _remove_partial(dst)
+    if digest is None:
+        shutil.copy(src, dst)
+    else:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            shutil.copyfileobj(digest.reader(fsrc), fdst, COPY_CHUNK_SIZE)
+        shutil.copymode(src, dst)
+    return "copy"
+
+def summarize_methods(methods):
+    """Collapse the per-file methods returned by publish_file into one label, e.g. "hardlink+copy" """
+    return "+".join(sorted(set(m for m in methods if m))) or None
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import shotgrid_config, resolve_path
+
+DEFAULT_PART_SIZE_MB = 16
+# S3-backed sites reject multipart parts under 5 MB (except the last), so smaller settings are raised to it
+MIN_PART_SIZE_MB = 5
+DEFAULT_UPLOAD_WORKERS = 4
+
+# Attempts per part before the upload gives up (and can be resumed later)
+PART_RETRIES = 3
+
+class UploadProgress:
+    """Bytes sent so far and the transfer rate, reported to an optional progress(sent, total, bytes_per_sec) callback"""
+    def __init__(self, total, callback=None, already_sent=0):
+        self.total = total
+        self.sent = already_sent
+        self.callback = callback
+        self._resumed_from = already_sent
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def rate(self):
+        elapsed = time.monotonic() - self._started
+        return (self.sent - self._resumed_from) / elapsed if elapsed > 0 else 0.0
+
+    def add(self, count):
+        with self._lock:
+            self.sent += count
+            if self.callback is not None:
+                self.callback(self.sent, self.total, self.rate())
+
+def get_state_path(version_id, field_name, file_path):
+    """Local file recording which parts of an upload already reached ShotGrid"""
+    state_dir = resolve_path(shotgrid_config.get("upload_state_dir", "upload_state"))
+    os.makedirs(state_dir, exist_ok=True)
+    key = hashlib.sha1(f"{version_id}:{field_name}:{os.path.abspath(file_path)}".encode()).hexdigest()
+    return os.path.join(state_dir, f"{key}.json")
+
+def _load_state(state_path, source):
+    """Saved state of an interrupted upload, or None if there is none or the file has changed since"""
+    try:
+        with open(state_path, "r") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if state.get("source") != source:
+        return None
+    return state
+
+def _save_state(state_path, state):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def upload_movie(sg, version_id, field_name, file_path, mime_type, progress=None, before_complete=None, file_name=None):
+    """Upload a file to a Version field, in concurrent fixed-size parts when it spans more than one part.
+
+    Each part is retried on its own. If the upload still fails, the parts that made it are recorded
+    in a local state file and calling this again for the same version and file only sends the rest.
+    before_complete() runs once every byte is sent and may raise to leave the upload uncompleted.
+    file_name is the name ShotGrid shows, file_path's by default.
+    """
+    file_name = file_name or file_path
+    part_size = max(MIN_PART_SIZE_MB, int(shotgrid_config.get("upload_part_size_mb", DEFAULT_PART_SIZE_MB))) * 1024 * 1024
+    workers = int(shotgrid_config.get("upload_workers", DEFAULT_UPLOAD_WORKERS))
+    stat = os.stat(file_path)
+    if stat.st_size <= part_size:
+        _upload_single(sg, version_id, field_name, file_path, mime_type, UploadProgress(stat.st_size, progress), file_name, before_complete)
+        return
+
+    state_path = get_state_path(version_id, field_name, file_path)
+    source = {"size": stat.st_size, "mtime": stat.st_mtime, "part_size": part_size}
+    state = _load_state(state_path, source)
+    first_link = None
+    if state is None:
+        file_upload_data = sg.request_file_upload(version_id, field_name, file_name, multipart=True)
+        if "get_next_part" not in file_upload_data["links"]:
+            # The site's storage does not support multipart uploads
+            _upload_single(sg, version_id, field_name, file_path, mime_type, UploadProgress(stat.st_size, progress), file_name, before_complete, file_upload_data)
+            return
+        first_link = file_upload_data["links"]["upload"]
+        state = {"source": source, "file_upload_data": file_upload_data, "etags": {}}
+        _save_state(state_path, state)
+    file_upload_data = state["file_upload_data"]
+
+    part_count = (stat.st_size + part_size - 1) // part_size
+    pending = [n for n in range(1, part_count + 1) if str(n) not in state["etags"]]
+    already_sent = stat.st_size - sum(min(part_size, stat.st_size - (n - 1) * part_size) for n in pending)
+    tracker = UploadProgress(stat.st_size, progress, already_sent)
+    state_lock = threading.Lock()
+
+    def send(part_number):
+        with open(file_path, "rb") as f:
+            f.seek((part_number - 1) * part_size)
+            data = f.read(part_size)
+        for attempt in range(PART_RETRIES):
+            try:
+                link = first_link if part_number == 1 and first_link and attempt == 0 else sg.request_upload_part(file_upload_data, part_number)
+                etag = sg.upload_part(link, data)
+                break
+            except Exception:
+                if attempt == PART_RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+        with state_lock:
+            state["etags"][str(part_number)] = etag
+            _save_state(state_path, state)
+        tracker.add(len(data))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="publish-upload") as executor:
+        futures = [executor.submit(send, part_number) for part_number in pending]
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise Exception(f"{len(errors)} of {part_count} parts failed to upload to ShotGrid, re-run to resume: {errors[0]}")
+
+    etags = [state["etags"][str(n)] for n in range(1, part_count + 1)]
+    if before_complete is not None:
+        before_complete()
+    sg.complete_file_upload(file_upload_data, {"etags": etags})
+    os.remove(state_path)
+
+def _upload_single(sg, version_id, field_name, file_path, mime_type, tracker, file_name, before_complete=None, file_upload_data=None):
+    if file_upload_data is None:
+        file_upload_data = sg.request_file_upload(version_id, field_name, file_name)
+    sg.upload_file(file_upload_data["links"]["upload"], file_path, mime_type)
+    tracker.add(tracker.total)
+    if before_complete is not None:
+        before_complete()
+    sg.complete_file_upload(file_upload_data)
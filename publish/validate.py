@@ -0,0 +1,182 @@
+import os
+import struct
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_VALIDATE_WORKERS = 32
+
+# First read of a frame; holds the header (and usually the offset table) of common EXR and PNG files
+HEADER_READ_SIZE = 64 * 1024
+
+# Bad frames listed in the error before the rest are only counted
+MAX_REPORTED_FRAMES = 20
+
+EXR_MAGIC = 20000630
+EXR_TILED_FLAG = 0x200
+EXR_DEEP_FLAG = 0x800
+EXR_MULTIPART_FLAG = 0x1000
+EXR_PIXEL_TYPES = {0: "uint", 1: "half", 2: "float"}
+EXR_COMPRESSIONS = ("none", "rle", "zips", "zip", "piz", "pxr24", "b44", "b44a", "dwaa", "dwab")
+# Scanlines stored per chunk by each EXR compression, in EXR_COMPRESSIONS order
+EXR_LINES_PER_CHUNK = {0: 1, 1: 1, 2: 1, 3: 16, 4: 32, 5: 16, 6: 32, 7: 32, 8: 32, 9: 256}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+PNG_COLOR_TYPES = {0: "gray", 2: "rgb", 3: "palette", 4: "gray+alpha", 6: "rgba"}
+# Signature, IHDR, an empty IDAT and IEND
+PNG_MIN_SIZE = 8 + 25 + 12 + 12
+
+def _read_at(f, offset, size):
+    f.seek(offset)
+    return f.read(size)
+
+def _parse_exr_attributes(data, pos):
+    """{name: (type, value bytes)} of an EXR header starting at pos, and the position after it"""
+    attributes = {}
+    while True:
+        end = data.index(b"\0", pos)
+        if end == pos:
+            return attributes, pos + 1
+        name = data[pos:end].decode("latin-1")
+        type_end = data.index(b"\0", end + 1)
+        type_name = data[end + 1:type_end].decode("latin-1")
+        (size,) = struct.unpack_from("<i", data, type_end + 1)
+        start = type_end + 5
+        if size < 0 or start + size > len(data):
+            raise IndexError(name)
+        attributes[name] = (type_name, data[start:start + size])
+        pos = start + size
+
+def _parse_exr_channels(value):
+    channels = []
+    pos = 0
+    while value[pos:pos + 1] not in (b"\0", b""):
+        end = value.index(b"\0", pos)
+        pixel_type, _, x_sampling, y_sampling = struct.unpack_from("<iB3xii", value, end + 1)
+        channels.append(f"{value[pos:end].decode('latin-1')}:{EXR_PIXEL_TYPES.get(pixel_type, pixel_type)}")
+        pos = end + 17
+    return tuple(channels)
+
+def read_exr_header(f, size):
+    """Dimensions, channel layout and compression of an open EXR file, raising ValueError if it is damaged or truncated"""
+    data = f.read(HEADER_READ_SIZE)
+    if len(data) < 8 or struct.unpack_from("<i", data)[0] != EXR_MAGIC:
+        raise ValueError("not an OpenEXR file")
+    flags = struct.unpack_from("<i", data, 4)[0]
+    while True:
+        try:
+            attributes, header_end = _parse_exr_attributes(data, 8)
+            break
+        except (IndexError, ValueError, struct.error):
+            # Header longer than the first read
+            if len(data) >= size:
+                raise ValueError("header is truncated")
+            data += f.read(len(data))
+    for name in ("channels", "compression", "dataWindow"):
+        if name not in attributes:
+            raise ValueError(f"header has no {name} attribute")
+    channels = _parse_exr_channels(attributes["channels"][1])
+    if not channels:
+        raise ValueError("header lists no channels")
+    x_min, y_min, x_max, y_max = struct.unpack("<iiii", attributes["dataWindow"][1][:16])
+    width, height = x_max - x_min + 1, y_max - y_min + 1
+    if width <= 0 or height <= 0:
+        raise ValueError(f"empty data window {width}x{height}")
+    compression = attributes["compression"][1][0]
+    header = {"format": "exr", "width": width, "height": height, "channels": channels, "compression": EXR_COMPRESSIONS[compression] if compression < len(EXR_COMPRESSIONS) else str(compression)}
+
+    lines_per_chunk = EXR_LINES_PER_CHUNK.get(compression)
+    if flags & (EXR_TILED_FLAG | EXR_DEEP_FLAG | EXR_MULTIPART_FLAG) or lines_per_chunk is None:
+        # Only the header is checked for layouts whose chunk count needs more than the data window
+        if size <= header_end:
+            raise ValueError("file ends after its header")
+        return header
+    # A scanline image is followed by one offset per chunk; every chunk must lie within the file
+    chunk_count = (height + lines_per_chunk - 1) // lines_per_chunk
+    table_end = header_end + 8 * chunk_count
+    if size < table_end + 8:
+        raise ValueError(f"file is {size} bytes, too small for its {chunk_count} chunk offsets")
+    table = data[header_end:table_end] if table_end <= len(data) else _read_at(f, header_end, 8 * chunk_count)
+    offsets = struct.unpack(f"<{chunk_count}Q", table)
+    last = max(offsets)
+    if min(offsets) < table_end or last + 8 > size:
+        raise ValueError("chunk offset table is incomplete or points past the end of the file, the file is truncated")
+    _, chunk_size = struct.unpack("<ii", _read_at(f, last, 8))
+    if chunk_size < 0 or last + 8 + chunk_size > size:
+        raise ValueError(f"file is truncated, its last chunk needs {last + 8 + chunk_size} bytes but the file has {size}")
+    return header
+
+def read_png_header(f, size):
+    """Dimensions, channel layout and compression of an open PNG file, raising ValueError if it is damaged or truncated"""
+    data = f.read(33)
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    if len(data) < 33 or data[12:16] != b"IHDR":
+        raise ValueError("PNG has no IHDR chunk")
+    width, height, bit_depth, color_type = struct.unpack_from(">IIBB", data, 16)
+    if width == 0 or height == 0:
+        raise ValueError(f"empty image {width}x{height}")
+    if size < PNG_MIN_SIZE:
+        raise ValueError(f"file is {size} bytes, too small for a PNG")
+    if _read_at(f, size - len(PNG_IEND), len(PNG_IEND)) != PNG_IEND:
+        raise ValueError("file does not end with an IEND chunk, the file is truncated")
+    channels = (f"{PNG_COLOR_TYPES.get(color_type, color_type)}:{bit_depth}",)
+    return {"format": "png", "width": width, "height": height, "channels": channels, "compression": "deflate"}
+
+def read_frame_header(path):
+    """Format, dimensions, channel layout and compression of an EXR or PNG frame, reading only its header and a few bytes.
+
+    Raises ValueError if the file is empty, not of the format its extension says, or truncated.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        raise ValueError("file is empty")
+    with open(path, "rb") as f:
+        if path.lower().endswith(".exr"):
+            return read_exr_header(f, size)
+        if path.lower().endswith(".png"):
+            return read_png_header(f, size)
+    raise ValueError("not an EXR or PNG file")
+
+def _layout(header):
+    return (header["width"], header["height"], header["channels"], header["compression"])
+
+def _describe(header):
+    return f"{header['width']}x{header['height']} {','.join(header['channels'])} {header['compression']}"
+
+def _check_frame(path):
+    try:
+        return read_frame_header(path), None
+    except (OSError, ValueError, struct.error) as e:
+        return None, str(e) or type(e).__name__
+
+def validate_frames(paths, workers=DEFAULT_VALIDATE_WORKERS):
+    """Read the header of every frame of a sequence over a worker pool and return the header most frames share.
+
+    Every frame must be a complete EXR or PNG with the dimensions, channels and compression of
+    most frames, so an odd first frame is reported rather than every frame after it.
+    Raises ValueError listing every bad frame at once.
+    """
+    paths = list(paths)
+    if not paths:
+        return None
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths))), thread_name_prefix="publish-validate") as executor:
+        results = list(executor.map(_check_frame, paths))
+
+    layouts = Counter(_layout(header) for header, _ in results if header is not None)
+    reference = None
+    if layouts:
+        layout = layouts.most_common(1)[0][0]
+        reference = next(header for header, _ in results if header is not None and _layout(header) == layout)
+    bad = []
+    for path, (header, error) in zip(paths, results):
+        if error is not None:
+            bad.append(f"{os.path.basename(path)}: {error}")
+        elif _layout(header) != _layout(reference):
+            bad.append(f"{os.path.basename(path)}: {_describe(header)}, expected {_describe(reference)} like most frames")
+    if bad:
+        listed = bad[:MAX_REPORTED_FRAMES]
+        if len(bad) > len(listed):
+            listed.append(f"... and {len(bad) - len(listed)} more")
+        raise ValueError(f"{len(bad)} of {len(paths)} frames in {os.path.dirname(paths[0])} are invalid:\n" + "\n".join(listed))
+    return reference
@@ -0,0 +1,41 @@
+"""A local fake ShotGrid site and a config.json pointing at it, for tests importing the publish modules.
+
+The publish modules read config.json once when first imported, so every test of a run shares this site.
+"""
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "bench"))
+
+from fake_shotgrid import FakeShotGrid, PROJECT_ID
+
+with open(os.path.join(REPO_DIR, "config.json"), "r") as f:
+    config = json.load(f)
+
+fake = FakeShotGrid(config["task_names"], shot_count=10)
+fake.start()
+atexit.register(fake.stop)
+
+work_dir = tempfile.mkdtemp(prefix="publish-tests-")
+atexit.register(shutil.rmtree, work_dir, True)
+
+config["shotgrid"].update({
+    "project_id": PROJECT_ID,
+    "server_url": fake.url,
+    "client_id": "tests",
+    "secret_file_path": "secret.txt",
+})
+config["metrics"]["enabled"] = False
+config["filesystem"]["output_dir"] = [os.path.join(work_dir, "publish"), "{SEQ_CODE}", "{SHOT_CODE}"]
+with open(os.path.join(work_dir, "secret.txt"), "w") as f:
+    f.write("tests")
+config_path = os.path.join(work_dir, "config.json")
+with open(config_path, "w") as f:
+    json.dump(config, f, indent=4)
+os.environ["PUBLISH_CONFIG_PATH"] = config_path
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "bench"))
+
+from publish.governor import RateGovernor
+from fake_shotgrid import FakeShotGrid
+
+class RateGovernorTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = None
+        self.client = requests.Session()
+        # (sent at, status) of every request that reached the fake site
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.client.close()
+        if self.fake is not None:
+            self.fake.stop()
+
+    def start_site(self, **kwargs):
+        self.fake = FakeShotGrid(["Comp"], shot_count=1, **kwargs)
+        self.url = f"{self.fake.start()}/api/v1.1/auth/access_token"
+
+    def send(self):
+        started = time.monotonic()
+        response = self.client.post(self.url)
+        with self.lock:
+            self.sent.append((started, response.status_code))
+        return response
+
+    def test_retry_after_is_honoured_and_the_rate_backs_off(self):
+        self.start_site(throttle_rate=2, retry_after=1)
+        governor = RateGovernor({"max_rate": 50, "rate_increase": 0.5, "rate_decrease": 0.5})
+
+        statuses = [governor.request(self.url, self.send).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 200])
+        self.assertEqual([status for _, status in self.sent], [200, 200, 429, 200])
+        # The throttled request is sent again only after the Retry-After the site asked for
+        self.assertGreaterEqual(self.sent[3][0] - self.sent[2][0], 1.0)
+        # Halved by the 429, then raised by one step by the success that followed
+        self.assertEqual(governor.rate(self.url), 25.5)
+
+    def test_in_flight_requests_never_exceed_the_cap(self):
+        self.start_site(latency=0.05)
+        governor = RateGovernor({"max_in_flight": 3, "max_rate": 1000})
+        in_flight = [0]
+        peak = [0]
+
+        def send():
+            with self.lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                return self.send()
+            finally:
+                with self.lock:
+                    in_flight[0] -= 1
+
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            responses = list(executor.map(lambda _: governor.request(self.url, send), range(24)))
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(peak[0], 3)
+
+    def test_waiting_coroutines_are_woken_by_released_slots(self):
+        governor = RateGovernor({"max_in_flight": 2, "max_rate": 1000})
+        in_flight = [0]
+        peak = [0]
+
+        class Response:
+            status_code = 200
+
+        async def send():
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.05)
+            in_flight[0] -= 1
+            return Response()
+
+        async def run():
+            started = time.monotonic()
+            await asyncio.gather(*(governor.request_async("http://shotgrid.test/api", send) for _ in range(8)))
+            return time.monotonic() - started
+
+        elapsed = asyncio.run(run())
+
+        self.assertEqual(peak[0], 2)
+        # Four rounds of two requests, each starting as soon as a slot is released
+        self.assertLess(elapsed, 0.5)
+
+if __name__ == "__main__":
+    unittest.main()
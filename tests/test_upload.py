@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fake_site import fake
+
+from publish import upload
+from publish.shotgrid import get_session
+
+MB = 1024 * 1024
+
+class ResumableUploadTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.movie = os.path.join(self.tmp.name, "proxy.mov")
+        with open(self.movie, "wb") as f:
+            f.write(os.urandom(12 * MB))
+        self.sg = get_session(upload.shotgrid_config, "artist01")
+        self.version_id = self.sg.add_version(f"UPLOAD_{self.id()}", 1, 1, {})["id"]
+        fake.fail_parts.clear()
+
+    def tearDown(self):
+        fake.fail_parts.clear()
+        self.tmp.cleanup()
+
+    def send_movie(self):
+        upload.upload_movie(self.sg, self.version_id, "sg_uploaded_movie", self.movie, "video/quicktime")
+
+    @mock.patch.dict(upload.shotgrid_config, {"upload_part_size_mb": 5, "upload_workers": 2})
+    @mock.patch.object(upload, "PART_RETRIES", 1)
+    def test_interrupted_upload_resumes_with_the_missing_parts(self):
+        before = set(fake.uploads)
+        fake.fail_parts.add(3)
+        with self.assertRaises(Exception) as raised:
+            self.send_movie()
+        self.assertIn("1 of 3 parts failed", str(raised.exception))
+        state_path = upload.get_state_path(self.version_id, "sg_uploaded_movie", self.movie)
+        self.assertTrue(os.path.exists(state_path))
+
+        (upload_id,) = set(fake.uploads) - before
+        self.assertEqual(sorted(fake.uploads[upload_id]["parts"]), [1, 2])
+        self.assertFalse(fake.uploads[upload_id]["completed"])
+
+        fake.fail_parts.clear()
+        stored = fake.requests["store"]
+        self.send_movie()
+        # Only the missing part is sent again, to the same upload
+        self.assertEqual(fake.requests["store"] - stored, 1)
+        self.assertEqual(set(fake.uploads) - before, {upload_id})
+        self.assertEqual(fake.uploads[upload_id]["parts"], {1: 5 * MB, 2: 5 * MB, 3: 2 * MB})
+        self.assertTrue(fake.uploads[upload_id]["completed"])
+        self.assertFalse(os.path.exists(state_path))
+
+    @mock.patch.dict(upload.shotgrid_config, {"upload_part_size_mb": 1})
+    def test_part_size_is_at_least_five_mb(self):
+        before = set(fake.uploads)
+        self.send_movie()
+        (upload_id,) = set(fake.uploads) - before
+        self.assertEqual(fake.uploads[upload_id]["parts"], {1: 5 * MB, 2: 5 * MB, 3: 2 * MB})
+        self.assertTrue(fake.uploads[upload_id]["completed"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "bench"))
+
+from publish.validate import validate_frames
+from synthetic import make_sequence, write_exr
+
+class ValidateFramesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.frames = make_sequence(self.tmp.name, 10, 64 * 1024, "exr")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_valid_sequence(self):
+        header = validate_frames(self.frames)
+        self.assertEqual(header["channels"], ("A:half", "B:half", "G:half", "R:half"))
+
+    def test_first_frame_outlier_is_the_only_bad_frame(self):
+        write_exr(self.frames[0], 16, 8, os.urandom(16 * 8 * 8))
+        with self.assertRaises(ValueError) as raised:
+            validate_frames(self.frames)
+        message = str(raised.exception)
+        self.assertIn("1 of 10 frames", message)
+        self.assertIn(os.path.basename(self.frames[0]), message)
+        self.assertIn("16x8", message)
+
+    def test_every_bad_frame_is_reported(self):
+        open(self.frames[2], "wb").close()
+        with open(self.frames[5], "r+b") as f:
+            f.truncate(os.path.getsize(self.frames[5]) - 100)
+        with self.assertRaises(ValueError) as raised:
+            validate_frames(self.frames)
+        message = str(raised.exception)
+        self.assertIn("2 of 10 frames", message)
+        self.assertIn(f"{os.path.basename(self.frames[2])}: file is empty", message)
+        self.assertIn(f"{os.path.basename(self.frames[5])}: file is truncated", message)
+
+if __name__ == "__main__":
+    unittest.main()
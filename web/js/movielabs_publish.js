@@ -0,0 +1,205 @@
+import { app } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
+
+// Nodes that get the search inputs and the publish progress panel
+const PUBLISH_NODES = ["PublishAsset", "PublishBatch", "PublishBlender"];
+
+// Text widget -> route suggesting its values
+const SEARCH_ROUTES = {
+    shot_code: "/movielabs/shots",
+    artist_login: "/movielabs/artists",
+};
+
+const SEARCH_LIMIT = 50;
+const SEARCH_DELAY_MS = 150;
+const PROGRESS_EVENT = "movielabs.publish.progress";
+// Milliseconds a finished publish stays in the panel
+const FINISHED_TTL_MS = 60000;
+
+const publishes = new Map();
+const progressPanels = new Set();
+
+async function search(route, params) {
+    const query = new URLSearchParams({ limit: SEARCH_LIMIT, ...params });
+    const response = await api.fetchApi(`${route}?${query}`);
+    if (!response.ok) {
+        return [];
+    }
+    return (await response.json()).matches;
+}
+
+function formatRate(bytesPerSec) {
+    return `${(bytesPerSec / (1024 * 1024)).toFixed(1)} MB/s`;
+}
+
+function describe(publish) {
+    const name = `${publish.shot_code} ${publish.task_name}`;
+    if (publish.status === "done") {
+        return `${publish.version_code || name}: done`;
+    }
+    if (publish.status === "failed") {
+        return `${name}: failed, ${publish.error}`;
+    }
+    const parts = [`${name}: ${publish.stage}`];
+    if (publish.copy.total) {
+        parts.push(`frames ${publish.copy.done}/${publish.copy.total} at ${formatRate(publish.copy.rate)}`);
+    }
+    if (publish.upload.total) {
+        const percent = Math.floor((100 * publish.upload.sent) / publish.upload.total);
+        parts.push(`upload ${percent}% at ${formatRate(publish.upload.rate)}`);
+    }
+    return parts.join(", ");
+}
+
+async function retryJob(publish) {
+    const response = await api.fetchApi(`/movielabs/jobs/${publish.job_id}/retry`, { method: "POST" });
+    if (response.ok) {
+        // The retried job reports its progress as a new publish
+        publishes.delete(publish.id);
+        renderPanels();
+    } else {
+        alert((await response.json()).error);
+    }
+}
+
+function renderLine(publish) {
+    const line = Object.assign(document.createElement("div"), { textContent: describe(publish) });
+    // Background publishes are journaled jobs, resumed from their last checkpoint when retried
+    if (publish.status === "failed" && publish.job_id) {
+        const button = Object.assign(document.createElement("button"), { textContent: "Retry" });
+        button.style.marginLeft = "6px";
+        button.addEventListener("click", () => retryJob(publish));
+        line.append(button);
+    }
+    return line;
+}
+
+function renderPanels() {
+    const sorted = [...publishes.values()].sort((a, b) => a.started_at - b.started_at);
+    for (const panel of progressPanels) {
+        panel.replaceChildren(...sorted.map(renderLine));
+        panel.style.display = sorted.length ? "block" : "none";
+    }
+}
+
+function updatePublish(publish) {
+    publishes.set(publish.id, publish);
+    if (publish.status !== "running") {
+        setTimeout(() => {
+            if (publishes.get(publish.id) === publish) {
+                publishes.delete(publish.id);
+                renderPanels();
+            }
+        }, FINISHED_TTL_MS);
+    }
+    renderPanels();
+}
+
+function hideWidget(widget) {
+    // Still serialized into the prompt and the workflow, only drawn by the search input instead
+    widget.type = "movielabs-hidden";
+    widget.computeSize = () => [0, -4];
+}
+
+function addSearchInput(node, widget, route, onChange) {
+    const input = document.createElement("input");
+    const list = document.createElement("datalist");
+    list.id = `movielabs-${widget.name}-${node.id}-${Math.random().toString(36).slice(2)}`;
+    input.setAttribute("list", list.id);
+    input.placeholder = widget.options?.label || widget.name;
+    input.value = widget.value ?? "";
+    input.style.width = "100%";
+    const container = document.createElement("div");
+    container.append(input, list);
+
+    let timer = null;
+    const suggest = () => {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            const matches = await search(route, { prefix: input.value });
+            list.replaceChildren(...matches.map((value) => Object.assign(document.createElement("option"), { value })));
+        }, SEARCH_DELAY_MS);
+    };
+    input.addEventListener("focus", suggest);
+    input.addEventListener("input", () => {
+        widget.value = input.value;
+        suggest();
+    });
+    input.addEventListener("change", () => {
+        widget.value = input.value;
+        onChange?.(input.value);
+    });
+
+    hideWidget(widget);
+    node.addDOMWidget(`${widget.name}_search`, "movielabs-search", container, {
+        getValue: () => input.value,
+        setValue: (value) => {
+            input.value = value;
+        },
+        serialize: false,
+    });
+    return input;
+}
+
+async function restrictTasks(taskWidget, allTasks, shotCode) {
+    // Only the tasks of the shot, or every task while the shot is unknown or the catalog is loading
+    const tasks = shotCode ? await search("/movielabs/tasks", { shot_code: shotCode }) : [];
+    const available = tasks.filter((task) => allTasks.includes(task));
+    taskWidget.options.values = available.length ? available : allTasks;
+}
+
+app.registerExtension({
+    name: "MovieLabs.Publish",
+
+    async setup() {
+        api.addEventListener(PROGRESS_EVENT, ({ detail }) => updatePublish(detail));
+        const response = await api.fetchApi("/movielabs/publishes");
+        if (response.ok) {
+            for (const publish of (await response.json()).publishes) {
+                updatePublish(publish);
+            }
+        }
+    },
+
+    nodeCreated(node) {
+        if (!PUBLISH_NODES.includes(node.comfyClass)) {
+            return;
+        }
+        const taskWidget = node.widgets?.find((widget) => widget.name === "task_name");
+        const allTasks = taskWidget ? [...taskWidget.options.values] : [];
+        const inputs = {};
+        for (const widget of node.widgets ?? []) {
+            const route = SEARCH_ROUTES[widget.name];
+            if (!route) {
+                continue;
+            }
+            const onChange = widget.name === "shot_code" && taskWidget ? (shotCode) => restrictTasks(taskWidget, allTasks, shotCode) : null;
+            inputs[widget.name] = [widget, addSearchInput(node, widget, route, onChange)];
+        }
+
+        // Values loaded with a saved workflow land in the hidden widgets
+        const onConfigure = node.onConfigure;
+        node.onConfigure = function () {
+            const result = onConfigure?.apply(this, arguments);
+            for (const [widget, input] of Object.values(inputs)) {
+                input.value = widget.value ?? "";
+            }
+            if (taskWidget && inputs.shot_code) {
+                restrictTasks(taskWidget, allTasks, inputs.shot_code[0].value);
+            }
+            return result;
+        };
+
+        const panel = document.createElement("div");
+        panel.style.fontSize = "11px";
+        panel.style.whiteSpace = "pre-wrap";
+        progressPanels.add(panel);
+        node.addDOMWidget("publish_progress", "movielabs-progress", panel, { serialize: false });
+        const onRemoved = node.onRemoved;
+        node.onRemoved = function () {
+            progressPanels.delete(panel);
+            return onRemoved?.apply(this, arguments);
+        };
+        renderPanels();
+    },
+});